@@ -0,0 +1,3 @@
+"""
+Общий для eex_ng и model_data_loader код подключения к БД
+"""
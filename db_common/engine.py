@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from pathlib import Path
+from sqlalchemy import create_engine, text, Engine, MetaData
+
+"""
+Общие для процесса движки БД и кэш отраженной схемы БД
+"""
+
+logger = logging.getLogger(__name__)
+
+# параметры пула соединений общего движка БД, см. get_engine
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))  # постоянные соединения
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))  # временные соединения сверх пула
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # время жизни соединения, с
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 600_000))  # ограничение времени запроса, мс
+
+# отпечаток схемы БД: меняется при изменении колонок или ограничений любой таблицы
+SCHEMA_HASH_QUERY = """
+SELECT md5(
+    coalesce((SELECT string_agg(table_name || '.' || column_name || ':' || data_type || ':' || is_nullable, ','
+                                ORDER BY table_name, ordinal_position)
+              FROM information_schema.columns
+              WHERE table_schema = current_schema()), '')
+    || coalesce((SELECT string_agg(table_name || '.' || constraint_name, ',' ORDER BY table_name, constraint_name)
+                 FROM information_schema.table_constraints
+                 WHERE table_schema = current_schema()), '')
+)
+"""
+
+
+# общие для процесса движки БД: {(DB_URI, pid): Engine}
+ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(in_db_uri: str) -> Engine:
+    """Возвращает общий для процесса движок БД
+
+    Все подключения с одинаковым `DB_URI` используют один движок и один пул соединений.
+    Ключ включает pid, так как соединения пула нельзя использовать в дочерних процессах.
+
+    Args:
+        in_db_uri: строка подключения к БД
+    Returns:
+        Engine: объект подключения engine
+    """
+    key = (in_db_uri, os.getpid())
+    with _ENGINES_LOCK:
+        if key not in ENGINES:
+            logger.debug('creating engine for %s', in_db_uri)
+            ENGINES[key] = create_engine(
+                in_db_uri, echo=False, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=True,
+                connect_args={'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'})
+        return ENGINES[key]
+
+
+def reflect_metadata(in_engine: Engine, in_tables: list | None, in_cache_dir: Path | None) -> MetaData:
+    """Отражает таблицы БД или загружает их из кэша
+
+    Отраженная схема сохраняется в `in_cache_dir` и используется повторно, пока не изменится
+    отпечаток схемы (см. `SCHEMA_HASH_QUERY`).
+
+    Args:
+        in_engine: движок БД
+        in_tables: наименования таблиц для отражения, None - все таблицы
+        in_cache_dir: папка для кэша отраженной схемы, None отключает кэш
+    Returns:
+        MetaData: отраженные таблицы
+    """
+    if in_cache_dir is not None:
+        with in_engine.connect() as connection:
+            schema_hash = connection.execute(text(SCHEMA_HASH_QUERY)).scalar()
+        key = (in_engine.url.render_as_string(hide_password=True), schema_hash,
+               sorted(in_tables) if in_tables is not None else None)
+        path = Path(in_cache_dir) / f'{hashlib.md5(repr(key).encode()).hexdigest()}.pkl'
+        try:
+            with open(path, 'rb') as file:
+                return pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+    metadata = MetaData()
+    metadata.reflect(in_engine, only=in_tables)
+    if in_cache_dir is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # сначала пишем во временный файл, чтобы параллельный запуск не прочитал его частично
+        temp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(temp_path, 'wb') as file:
+            pickle.dump(metadata, file)
+        os.replace(temp_path, path)
+        logger.debug('reflected schema saved to %s', path)
+    return metadata
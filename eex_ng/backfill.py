@@ -0,0 +1,161 @@
+import logging
+import os
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from eex_ng.daysback_limits import INDICES_DAYSBACK_LIMIT, SPOT_DAYSBACK_LIMIT, FUTURES_DAYSBACK_LIMIT
+from eex_ng.eex_ng_futures_parser import EexNaturalGasFuturesParser
+from eex_ng.eex_ng_indices_parser import EexNaturalGasIndicesParser
+from eex_ng.eex_ng_spot_parser import EexNaturalGasSpotParser
+from eex_ng.fetcher import ConcurrentFetcher, get_default_fetcher
+from eex_ng.trading_calendar import TradingCalendar
+
+"""
+Splits a long date range into chunks each EEX endpoint can return in full,
+parses chunks in parallel with on-disk checkpoints and reports coverage gaps
+"""
+
+# default location of parsed chunks
+CHECKPOINT_DIR = Path.cwd() / 'output' / 'backfill'
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BackfillChunk:
+    parser: type
+    start_date: date
+    end_date: date
+
+    def get_checkpoint_name(self) -> str:
+        return f'{self.parser.__name__}_{self.start_date:%Y%m%d}_{self.end_date:%Y%m%d}.pkl'
+
+
+@dataclass(frozen=True)
+class CoverageGap:
+    parser: type
+    start_date: date
+    end_date: date
+
+
+class BackfillPlanner:
+    """
+    Class to parse EEX Natural Gas Indices, Spot and Futures over a long date range
+    """
+
+    # max number of days in a single chunk for every parser.
+    # Indices and spot responses are truncated to INDICES/SPOT_DAYSBACK_LIMIT items,
+    # futures are requested per day, so their chunks are only a unit of parallelism and checkpointing
+    chunk_days = {
+        EexNaturalGasIndicesParser: INDICES_DAYSBACK_LIMIT,
+        EexNaturalGasSpotParser: SPOT_DAYSBACK_LIMIT,
+        EexNaturalGasFuturesParser: 30,
+    }
+
+    # max number of days back the endpoint has any data for
+    available_days = {
+        EexNaturalGasFuturesParser: FUTURES_DAYSBACK_LIMIT,
+    }
+
+    def __init__(self, end_date: date, start_date: date, checkpoint_dir: Path = CHECKPOINT_DIR,
+                 max_workers: int = 4, parsers: list[type] = None, fetcher: ConcurrentFetcher = None,
+                 calendar: TradingCalendar = None):
+        """
+        :param checkpoint_dir: directory for parsed chunks, existing chunks are not parsed again
+        :param max_workers: number of chunks parsed simultaneously
+        :param parsers: parser classes to run, all of them by default
+        :param fetcher: fetcher shared by parsers of all chunks, so that its concurrency and per-host rate limits
+                        hold for the whole backfill. By default the process-wide one with responses
+                        cached on disk, see get_default_fetcher
+        :param calendar: trading days checked for gaps, by default the one with holidays from HOLIDAY_FILE
+        """
+        if end_date - start_date < timedelta(0):
+            raise Exception("End_date can't be before Start_date")
+        self.start_date = pd.Timestamp(start_date).date()
+        self.end_date = pd.Timestamp(end_date).date()
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.max_workers = max_workers
+        self.parsers = list(self.chunk_days) if parsers is None else parsers
+        self.fetcher = get_default_fetcher() if fetcher is None else fetcher
+        self.calendar = TradingCalendar.from_file() if calendar is None else calendar
+        self.parsed_dates = {}
+
+    def get_available_start_date(self, parser: type) -> date:
+        if parser not in self.available_days:
+            return self.start_date
+        return max(self.start_date, date.today() - timedelta(days=self.available_days[parser]))
+
+    def plan(self) -> list[BackfillChunk]:
+        """
+        :return: chunks covering the date range, the most recent first
+        """
+        chunks = []
+        for parser in self.parsers:
+            start_date = self.get_available_start_date(parser)
+            chunk_end_date = self.end_date
+            while chunk_end_date >= start_date:
+                chunk_start_date = max(start_date, chunk_end_date - timedelta(days=self.chunk_days[parser] - 1))
+                chunks.append(BackfillChunk(parser, chunk_start_date, chunk_end_date))
+                chunk_end_date = chunk_start_date - timedelta(days=1)
+        return chunks
+
+    def parse_chunk(self, chunk: BackfillChunk) -> pd.DataFrame:
+        """
+        parses chunk or loads it from checkpoint, if it was parsed before.
+        Chunks including the current day are not checkpointed, as their data is not final yet
+        """
+        checkpoint_path = self.checkpoint_dir / chunk.get_checkpoint_name()
+        if checkpoint_path.exists():
+            return pd.read_pickle(checkpoint_path)
+        df = chunk.parser(end_date=chunk.end_date, start_date=chunk.start_date, fetcher=self.fetcher).parse()
+        if chunk.end_date >= date.today():
+            return df
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        # write to temporary file first, so that an interrupted run never leaves a partial checkpoint
+        temp_path = checkpoint_path.with_suffix('.tmp')
+        df.to_pickle(temp_path)
+        os.replace(temp_path, checkpoint_path)
+        return df
+
+    def parse(self) -> pd.DataFrame:
+        """
+        Parse all chunks and form Pandas.DataFrame
+        :return: DataFrame
+        """
+        chunks = self.plan()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            frames = list(pool.map(self.parse_chunk, chunks))
+        self.parsed_dates = {parser: set() for parser in self.parsers}
+        for chunk, df in zip(chunks, frames):
+            self.parsed_dates[chunk.parser].update(pd.to_datetime(df['date']).dt.normalize())
+        return pd.concat(frames, ignore_index=True)
+
+    def find_gaps(self) -> list[CoverageGap]:
+        """
+        Finds trading days of the date range without parsed prices, must be called after parse
+        :return: gaps, including days before the earliest available date of the endpoint
+        """
+        days = pd.date_range(self.start_date, self.end_date)
+        trading_days = pd.Series(days[self.calendar.is_trading_day(days)])
+        gaps = []
+        for parser in self.parsers:
+            is_missing = ~trading_days.isin(self.parsed_dates[parser])
+            # consecutive trading days are merged into a single gap, weekends and holidays do not split it
+            gap_ids = (~is_missing).cumsum()[is_missing]
+            for _, gap in trading_days[is_missing].groupby(gap_ids):
+                gaps.append(CoverageGap(parser, gap.iloc[0].date(), gap.iloc[-1].date()))
+        return gaps
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    planner = BackfillPlanner(end_date=date.today(), start_date=date.today() - timedelta(days=2 * 365))
+    result = planner.parse()
+    for coverage_gap in planner.find_gaps():
+        logger.warning('%s: no data from %s to %s', coverage_gap.parser.__name__, coverage_gap.start_date,
+                       coverage_gap.end_date)
+    # result.to_excel('./output/out_backfill.xlsx')
@@ -1,6 +1,7 @@
 
 import os
 from dataclasses import dataclass
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv('/srv/sstd/.env')
@@ -60,3 +61,6 @@ _ANALYTICS_BASE_DB_CONFIG = DBConfig(DBMS=os.environ.get('DATABASE_DIALECT'),
 # эту переменную, потому что в ней есть атрибут DB_URL, подаваемый в
 # SQLAlchemy при создании движка
 ANALYTICS_BASE_DB_CONFIG = DBConfigInstance(_ANALYTICS_BASE_DB_CONFIG)
+
+# папка для кэша отраженной схемы БД, см. DBConnector.connect_to_base
+SCHEMA_CACHE_DIR = Path.home() / '.cache' / 'eex_ng' / 'schema'
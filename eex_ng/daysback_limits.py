@@ -1,10 +1,17 @@
-import requests
+from eex_ng import http_client
 from datetime import timedelta, datetime
 
 """
 Finds the limit of daysback for EEX requests
 """
 
+# limits found by the functions below, tested on 7 april 2023:
+# max number of items in indices and spot responses
+INDICES_DAYSBACK_LIMIT = 779
+SPOT_DAYSBACK_LIMIT = 779
+# max number of days back for which futures chains are available
+FUTURES_DAYSBACK_LIMIT = 652
+
 headers = {
     'Origin': 'https://www.eex.com',
     'Referer': 'https://www.eex.com/',
@@ -37,7 +44,7 @@ def find_daysback_limit_for_indices() -> int:
             'aggregatepriceselection': 'First'
         }
 
-        r = requests.get(url, params=params, headers=headers)
+        r = http_client.get(url, params=params, headers=headers)
 
         new_size = len(r.json()['results']['items'])
         if new_size != 0:
@@ -72,7 +79,7 @@ def find_daysback_limit_for_spot() -> int:
             'dailybarinterval': 'Days',
             'aggregatepriceselection': 'First'
         }
-        r = requests.get(url, params=params, headers=headers)
+        r = http_client.get(url, params=params, headers=headers)
 
         new_size = len(r.json()['results']['items'])
         if new_size != 0:
@@ -105,7 +112,7 @@ def find_daysback_limit_for_futures():
                 'optionroot': symbol,
                 'onDate': on_date.strftime('%Y/%m/%d')
             }
-            r = requests.get(url, params=params, headers=headers)
+            r = http_client.get(url, params=params, headers=headers)
             new_size = len(r.json()['results']['items'])
             k = k + 1
             # if we get more than 15 empty responses in a row, step back and decrease step
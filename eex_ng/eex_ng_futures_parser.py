@@ -1,8 +1,9 @@
 import pandas as pd
-import requests
 
-from datetime import date, timedelta, datetime
+from datetime import date, timedelta
 from eex_ng.eex_periods import Day, Weekend, Week, Month, Quarter, Season, Year, Period
+from eex_ng.fetcher import ConcurrentFetcher, get_default_fetcher
+from eex_ng.response_decoder import decode_items
 from eex_ng.pandas_configurator import PandasConfigurator
 from eex_ng.utils import daterange
 from eex_loader.exxeta_settings import CURRENCIES, UNITS
@@ -45,9 +46,13 @@ class EexNaturalGasFuturesParser:
         '/E.G3': 'TTF EGSI'  # code is the same as for the non EGSI
     }
 
-    pc = PandasConfigurator()
-
-    def __init__(self, end_date: date, start_date: date = None):
+    def __init__(self, end_date: date, start_date: date = None, fetcher: ConcurrentFetcher = None):
+        """
+        :param fetcher: fetcher making requests to webservice, by default the process-wide one
+                        (up to 8 concurrent requests, responses cached on disk), see get_default_fetcher
+        """
+        self.fetcher = get_default_fetcher() if fetcher is None else fetcher
+        self.pc = PandasConfigurator()
         if start_date is None:
             self.start_date = end_date - timedelta(days=10)
         else:
@@ -63,11 +68,12 @@ class EexNaturalGasFuturesParser:
         :return: DataFrame
         """
 
+        requests_list = []
         for on_date in daterange(self.start_date, self.end_date):
             if on_date.weekday() >= 5:
                 continue
             for period in [Month(), Quarter(), Season(), Year()]:
-                self.make_requests(
+                requests_list += self.get_requests(
                     # dictionary that contains {'<symbol_for_request>': '<hub_name>'}
                     symbols={'"' + symbol + period.symbol + '"': self.symbols[symbol] for symbol in self.symbols},
                     on_date=on_date,
@@ -76,7 +82,7 @@ class EexNaturalGasFuturesParser:
 
             # EGSI requests
             for period in [Day(), Weekend(), Week(), Month(), Quarter(), Season(), Year()]:
-                self.make_requests(
+                requests_list += self.get_requests(
                     # dictionary that contains {'<symbol_for_request>': '<hub_name>'}
                     symbols={'"' + symbol + period.symbol_egsi + '"': self.symbols_EGSI[symbol] for symbol in
                              self.symbols_EGSI},
@@ -84,13 +90,15 @@ class EexNaturalGasFuturesParser:
                     period=period
                 )
 
-            self.make_requests(
+            requests_list += self.get_requests(
                 # dictionary that contains {'<symbol_for_request>': '<hub_name>'}
                 symbols={'"/E.GLJM"': 'JKM'},
                 on_date=on_date,
                 period=Month()
             )
 
+        self.fetch(requests_list)
+
         self.pc.df = self.pc.df.dropna(subset=['price'])
         self.pc.df = self.pc.df.drop(self.pc.df[self.pc.df.price <= 0].index)
         self.pc.df['date'] = pd.to_datetime(self.pc.df['date'])
@@ -102,30 +110,45 @@ class EexNaturalGasFuturesParser:
         """
         makes requests and appends response to DataFrame using PandasConfigurator
         """
-        for symbol, hub_name in symbols.items():
-            params = {
-                'optionroot': symbol,
-                'onDate': on_date.strftime('%Y/%m/%d')
-            }
-            r = requests.get(self.url, params=params, headers=self.headers)
-
-            df = pd.DataFrame(r.json()['results']['items'])
-            if len(r.json()['results']['items']) != 0:
-                df['gv.displaydate'] = df['gv.displaydate'].map(lambda d: datetime.strptime(d, "%m/%d/%Y"))
-                for price, price_type in {'ontradeprice': 'PX_LAST', 'close': 'PX_SETTLE'}.items():
-                    self.pc.append(
-                        date=df['tradedatetimegmt'],
-                        price=df[price],
-                        hub=hub_name,
-                        currency=CURRENCIES[hub_name],
-                        unit=UNITS[hub_name],
-                        prices_name='EEX ' + hub_name + ' Natural Gas Futures',
-                        price_type=price_type,
-                        products=df['gv.displaydate'].map(period.get_products),
-                        product_type=period.print(),
-                        beg_date=df['gv.displaydate'],
-                        id_source=9
-                    )
+        self.fetch(self.get_requests(symbols, on_date, period))
+
+    @staticmethod
+    def get_requests(symbols, on_date, period: Period) -> list[tuple[dict, str, Period]]:
+        """
+        :return: list of (<request params>, <hub_name>, <period>)
+        """
+        return [({'optionroot': symbol, 'onDate': on_date.strftime('%Y/%m/%d')}, hub_name, period)
+                for symbol, hub_name in symbols.items()]
+
+    def fetch(self, requests_list: list[tuple[dict, str, Period]]):
+        """
+        makes requests concurrently and appends responses to DataFrame in the order of requests_list
+        """
+        responses = self.fetcher.fetch_all(self.url, [params for params, _, _ in requests_list], self.headers)
+        for response, (_, hub_name, period) in zip(responses, requests_list):
+            self.append_response(response, hub_name, period)
+
+    def append_response(self, content: bytes, hub_name: str, period: Period):
+        """
+        appends response to DataFrame using PandasConfigurator
+        """
+        items = decode_items(content, ['tradedatetimegmt', 'gv.displaydate'], ['ontradeprice', 'close'])
+        if len(items['tradedatetimegmt']) != 0:
+            display_dates = pd.Series(pd.to_datetime(items['gv.displaydate'], format="%m/%d/%Y"))
+            for price, price_type in {'ontradeprice': 'PX_LAST', 'close': 'PX_SETTLE'}.items():
+                self.pc.append(
+                    date=items['tradedatetimegmt'],
+                    price=items[price],
+                    hub=hub_name,
+                    currency=CURRENCIES[hub_name],
+                    unit=UNITS[hub_name],
+                    prices_name='EEX ' + hub_name + ' Natural Gas Futures',
+                    price_type=price_type,
+                    products=period.get_products_series(display_dates),
+                    product_type=period.print(),
+                    beg_date=display_dates,
+                    id_source=9
+                )
 
     def get_df(self):
         return self.pc.df
@@ -1,9 +1,11 @@
 import re
 import pandas as pd
-import requests
 
 from datetime import date, timedelta
+from eex_ng import http_client
+from eex_ng.fetcher import ConcurrentFetcher, get_default_fetcher
 from eex_ng.pandas_configurator import PandasConfigurator
+from eex_ng.response_decoder import decode_items
 from eex_loader.exxeta_settings import UNITS, CURRENCIES
 
 
@@ -50,9 +52,13 @@ class EexNaturalGasIndicesParser:
         '"$E.GBBM"': 'ZTP',
     }
 
-    pc = PandasConfigurator()
-
-    def __init__(self, end_date: date, start_date: date = None):
+    def __init__(self, end_date: date, start_date: date = None, fetcher: ConcurrentFetcher = None):
+        """
+        :param fetcher: fetcher making requests to webservice, by default the process-wide one with responses
+                        cached on disk, see get_default_fetcher
+        """
+        self.fetcher = get_default_fetcher() if fetcher is None else fetcher
+        self.pc = PandasConfigurator()
         if start_date is None:
             self.start_date = end_date - timedelta(days=10)
         else:
@@ -84,22 +90,21 @@ class EexNaturalGasIndicesParser:
         return self.pc.df
 
     def make_requests(self, symbols, products, product_type):
-        for symbol, hub_name in symbols.items():
-            params = {
-                'priceSymbol': symbol,
-                # if end_date == start_date response will contain 1 item
-                'daysback': str((self.end_date - self.start_date).days + 1),
-                'chartstopdate': self.end_date.strftime('%Y/%m/%d'),
-                'dailybarinterval': 'Days',
-                'aggregatepriceselection': 'First'
-            }
-            r = requests.get(self.url, params=params, headers=self.headers)
-
-            df = pd.DataFrame(r.json()['results']['items'])
-            if len(r.json()['results']['items']) != 0:
+        params_list = [{
+            'priceSymbol': symbol,
+            # if end_date == start_date response will contain 1 item
+            'daysback': str((self.end_date - self.start_date).days + 1),
+            'chartstopdate': self.end_date.strftime('%Y/%m/%d'),
+            'dailybarinterval': 'Days',
+            'aggregatepriceselection': 'First'
+        } for symbol in symbols]
+        responses = self.fetcher.fetch_all(self.url, params_list, self.headers)
+        for content, hub_name in zip(responses, symbols.values()):
+            items = decode_items(content, ['tradedatetimegmt'], ['close'])
+            if len(items['tradedatetimegmt']) != 0:
                 self.pc.append(
-                    date=df['tradedatetimegmt'],
-                    price=df['close'],
+                    date=items['tradedatetimegmt'],
+                    price=items['close'],
                     hub=hub_name,
                     currency=CURRENCIES[hub_name],
                     unit=UNITS[hub_name],
@@ -121,7 +126,7 @@ class EexNaturalGasIndicesParser:
         return self.get_symbols([r'(?<=let baseSymbols = \[).+(?=];)', r'"#E\.[A-Z0-9_]+"'])
 
     def get_symbols(self, patterns):
-        r = requests.get('https://www.eex.com/en/market-data/natural-gas/indices', headers=self.headers)
+        r = http_client.get('https://www.eex.com/en/market-data/natural-gas/indices', headers=self.headers)
         symbol_list = re.findall(patterns[0], r.text)
         symbols = re.findall(patterns[1], symbol_list[0])
         return symbols
@@ -1,9 +1,10 @@
 
 import pandas as pd
-import requests
 
 from datetime import date, timedelta
+from eex_ng.fetcher import ConcurrentFetcher, get_default_fetcher
 from eex_ng.pandas_configurator import PandasConfigurator
+from eex_ng.response_decoder import decode_items
 from eex_loader.exxeta_settings import UNITS, CURRENCIES
 
 
@@ -50,14 +51,16 @@ class EexNaturalGasSpotParser:
         '"#E.ZTP_GTND"':  'ZEE',
     }
 
-    pc = PandasConfigurator()
-
-    def __init__(self, end_date: date, start_date: date = None):
+    def __init__(self, end_date: date, start_date: date = None, fetcher: ConcurrentFetcher = None):
         """
         Парсер вернет <(end_date-start_date).days + 1> значений, заканчивая ближайшей к end_date датой,
          содержащей действительное значение
+        :param fetcher: fetcher making requests to webservice, by default the process-wide one with responses
+                        cached on disk, see get_default_fetcher
         """
         # ^-- Это связано со спецификой формата запросов
+        self.fetcher = get_default_fetcher() if fetcher is None else fetcher
+        self.pc = PandasConfigurator()
         if start_date is None:
             self.start_date = end_date - timedelta(days=10)
         else:
@@ -92,21 +95,21 @@ class EexNaturalGasSpotParser:
         """
         make requests and append response to DataFrame using PandasConfigurator
         """
-        for symbol, hub_name in symbols.items():
-            params = {
-                'priceSymbol': symbol,
-                # if end_date == start_date response will contain 1 item
-                'chartstartdate': self.start_date.strftime('%Y/%m/%d'),
-                'chartstopdate': self.end_date.strftime('%Y/%m/%d'),
-                'dailybarinterval': 'Days',
-                'aggregatepriceselection': 'First'
-            }
-            r = requests.get(self.url, params=params, headers=self.headers)
-            df = pd.DataFrame(r.json()['results']['items'])
-            if len(r.json()['results']['items']) != 0:
+        params_list = [{
+            'priceSymbol': symbol,
+            # if end_date == start_date response will contain 1 item
+            'chartstartdate': self.start_date.strftime('%Y/%m/%d'),
+            'chartstopdate': self.end_date.strftime('%Y/%m/%d'),
+            'dailybarinterval': 'Days',
+            'aggregatepriceselection': 'First'
+        } for symbol in symbols]
+        responses = self.fetcher.fetch_all(self.url, params_list, self.headers)
+        for content, hub_name in zip(responses, symbols.values()):
+            items = decode_items(content, ['tradedatetimegmt'], ['ontradeprice'])
+            if len(items['tradedatetimegmt']) != 0:
                 self.pc.append(
-                    date=df['tradedatetimegmt'],
-                    price=df['ontradeprice'],
+                    date=items['tradedatetimegmt'],
+                    price=items['ontradeprice'],
                     hub=hub_name,
                     currency=CURRENCIES[hub_name],
                     unit=UNITS[hub_name],
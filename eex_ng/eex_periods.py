@@ -1,8 +1,16 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
 import pandas as pd
 
 
+def _short_years(dates: pd.Series) -> pd.Series:
+    """
+    last two digits of years as strings, same as str(date.year)[2:]
+    """
+    return dates.dt.year.astype(str).str[2:]
+
+
 class Period(ABC):
     """
     Класс для описания периодов
@@ -16,6 +24,14 @@ class Period(ABC):
         """
         pass
 
+    @staticmethod
+    @abstractmethod
+    def get_products_series(dates: pd.Series) -> pd.Series:
+        """
+        converts Series of datetimes into products, vectorised version of get_products
+        """
+        pass
+
     def print(self):
         return self.__class__.__name__
 
@@ -28,6 +44,10 @@ class Day(Period):
         dayli = date.strftime("%d/%m/%Y")
         return f"{dayli}".upper()
 
+    @staticmethod
+    def get_products_series(dates: pd.Series) -> pd.Series:
+        return dates.dt.strftime("%d/%m/%Y").str.upper()
+
 
 class Weekend(Period):
     symbol_egsi = 'W_WEEK'
@@ -37,6 +57,10 @@ class Weekend(Period):
         weekend = date.strftime("%d/%m")
         return f"WkEnd {weekend}".upper()
 
+    @staticmethod
+    def get_products_series(dates: pd.Series) -> pd.Series:
+        return ("WkEnd " + dates.dt.strftime("%d/%m")).str.upper()
+
 
 class Week(Period):
     symbol_egsi = 'F_WEEK'
@@ -46,6 +70,10 @@ class Week(Period):
         week_str = date.strftime("%W")
         return f"Week {week_str}/{str(date.year)[2:]}".upper()
 
+    @staticmethod
+    def get_products_series(dates: pd.Series) -> pd.Series:
+        return ("Week " + dates.dt.strftime("%W") + "/" + _short_years(dates)).str.upper()
+
 
 class Month(Period):
     symbol = 'BM'
@@ -56,6 +84,10 @@ class Month(Period):
         month_str = date.strftime("%b")
         return f"{month_str}/{str(date.year)[2:]}".upper()
 
+    @staticmethod
+    def get_products_series(dates: pd.Series) -> pd.Series:
+        return (dates.dt.strftime("%b") + "/" + _short_years(dates)).str.upper()
+
 
 class Quarter(Period):
     symbol = 'BQ'
@@ -67,6 +99,10 @@ class Quarter(Period):
         quarter = pd.Timestamp(date).quarter
         return f"{quarter}/{str(year)[2:]}".upper()
 
+    @staticmethod
+    def get_products_series(dates: pd.Series) -> pd.Series:
+        return (dates.dt.quarter.astype(str) + "/" + _short_years(dates)).str.upper()
+
 
 class Season(Period):
     symbol = 'BS'
@@ -77,6 +113,11 @@ class Season(Period):
         season = 'SUM' if date.month in range(3, 9) else 'WIN'
         return f"{season}-{str(date.year)[2:]}".upper()
 
+    @staticmethod
+    def get_products_series(dates: pd.Series) -> pd.Series:
+        seasons = pd.Series(np.where(dates.dt.month.between(3, 8), 'SUM', 'WIN'), index=dates.index)
+        return (seasons + "-" + _short_years(dates)).str.upper()
+
 
 class Year(Period):
     symbol = 'BY'
@@ -86,3 +127,7 @@ class Year(Period):
     def get_products(date) -> str:
         year = date.strftime("%Y")
         return f"Cal-{str(year)[2:]}".upper()
+
+    @staticmethod
+    def get_products_series(dates: pd.Series) -> pd.Series:
+        return ("Cal-" + _short_years(dates)).str.upper()
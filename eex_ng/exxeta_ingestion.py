@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from pandas import DataFrame, read_csv, read_excel, to_datetime, to_numeric
+from pandas.util import hash_pandas_object
+from exxeta_settings import DATA_DIR, DATA_FILE_PATTERNS, MANIFEST_FILE, INGESTION_MAX_WORKERS, MAIN_COLUMNS, \
+    CURRENCIES, UNITS
+from exxeta_preprocessing import parse_contracts, classify_contracts, classify_venues, get_delivery_profiles, \
+    get_delivery_periods, get_delivery_hours, SPOT_PRODUCT_TYPES
+from trading_calendar import TradingCalendar
+
+"""
+Загрузка файлов экзиты из DATA_DIR: манифест уже загруженных файлов, параллельный разбор новых файлов
+в пуле процессов и запись разобранных сделок одним загрузчиком
+"""
+
+logger = logging.getLogger(__name__)
+
+# наименования колонок сделки (см. `Deal`), соответствующие MAIN_COLUMNS
+RAW_COLUMNS = dict(zip(MAIN_COLUMNS, ['date', 'contract', 'volume', 'price']))
+
+# календарь для расчета периодов и часов поставки, загружается один раз в каждом процессе
+CALENDAR = TradingCalendar.from_file()
+
+
+@dataclass
+class ManifestEntry:
+    """Запись манифеста о загруженном файле
+
+    Attributes:
+        path: путь к файлу относительно папки с данными
+        size: размер файла в байтах
+        mtime: время изменения файла (unix time)
+        sha256: хэш содержимого файла
+        rows_loaded: количество прочитанных строк файла, включая строки без загружаемых сделок
+                     (см. `read_raw_file`)
+        loaded_at: время загрузки в формате ISO
+        rows_hash: хэш прочитанных строк файла, по которому проверяется, что файл только дополнен
+    """
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+    rows_loaded: int
+    loaded_at: str
+    rows_hash: str = ''
+
+
+@dataclass(frozen=True)
+class ParsedFile:
+    """Результат разбора файла в процессе пула
+
+    Attributes:
+        path: путь к файлу относительно папки с данными
+        size: размер файла в байтах на момент чтения
+        mtime: время изменения файла на момент чтения
+        sha256: хэш содержимого файла
+        deals: разобранные сделки или None, если содержимое файла не изменилось с последней загрузки
+        row_hashes: хэши всех строк файла (см. `get_row_hashes`) или None вместе с `deals`
+    """
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+    deals: DataFrame | None
+    row_hashes: np.ndarray | None = None
+
+
+def read_raw_file(in_content: bytes, in_path: Path) -> DataFrame:
+    """Читает колонки MAIN_COLUMNS всех строк файла экзиты
+
+    Значения читаются без приведения колонок к общему типу (числа и даты excel остаются значениями ячеек,
+    строки csv - текстом), поэтому дописанные строки не меняют представление уже прочитанных (см. `get_row_hashes`).
+
+    Args:
+        in_content: содержимое файла
+        in_path: путь к файлу, по расширению которого выбирается формат
+    Returns:
+        DataFrame - колонки RAW_COLUMNS, индекс - номер строки файла
+    """
+    if in_path.suffix.lower() == '.csv':
+        raw = read_csv(BytesIO(in_content), usecols=MAIN_COLUMNS, dtype=object)
+    else:
+        raw = read_excel(BytesIO(in_content), usecols=MAIN_COLUMNS, dtype=object)
+    return raw.rename(columns=RAW_COLUMNS)[list(RAW_COLUMNS.values())]
+
+
+def get_row_hashes(in_raw: DataFrame) -> np.ndarray:
+    """Считает хэши строк файла по их текстовому представлению
+
+    Args:
+        in_raw: строки файла, см. `read_raw_file`
+    Returns:
+        ndarray - хэш каждой строки
+    """
+    return hash_pandas_object(in_raw.astype(str), index=False).to_numpy()
+
+
+def hash_rows(in_row_hashes: np.ndarray) -> str:
+    """Считает хэш строк файла для манифеста
+
+    Args:
+        in_row_hashes: хэши строк, см. `get_row_hashes`
+    Returns:
+        str - хэш строк
+    """
+    return hashlib.sha256(in_row_hashes.tobytes()).hexdigest()
+
+
+def read_deals(in_raw: DataFrame, in_name: str) -> DataFrame:
+    """Формирует сделки со всеми колонками `Deal` из строк файла экзиты
+
+    Строки без спецификации пропускаются. Продукты, специфичные дополнения, товар и пункты поставки
+    разбираются `parse_contracts` и `classify_contracts`, площадка - `classify_venues`.
+    Валюта и единица измерения определяются по первому пункту поставки, тип инструмента - по наличию второго
+    продукта, тип продукта, периоды и часы поставки обоих продуктов - календарем CALENDAR. Тип периода поставки -
+    'Spot' для поставки в пределах текущего месяца (SPOT_PRODUCT_TYPES), иначе 'Forward'.
+
+    Сделки, которые не могут быть загружены (неизвестные дата, объем, цена, пункт поставки или период поставки,
+    либо заданы и второй пункт поставки, и второй продукт), отбрасываются. Номер строки файла каждой сделки
+    сохраняется в колонке 'row', что позволяет загружать только строки, дописанные в конец файла.
+
+    Args:
+        in_raw: строки файла, см. `read_raw_file`
+        in_name: имя файла для сообщений
+    Returns:
+        DataFrame - сделки файла
+    """
+    deals = in_raw.dropna(subset=['contract']).rename_axis('row').reset_index()
+    deals['date'] = to_datetime(deals['date'], dayfirst=True, errors='coerce')
+    deals['volume'] = to_numeric(deals['volume'], errors='coerce')
+    deals['price'] = to_numeric(deals['price'], errors='coerce')
+    deals = deals.join(parse_contracts(deals['contract'])).join(classify_contracts(deals['contract']))
+    deals['venue'] = classify_venues(deals['contract'])
+    deals['currency'] = deals['delivery_point_1'].map(CURRENCIES)
+    deals['unit'] = deals['delivery_point_1'].map(UNITS)
+    deals['instrument_type'] = np.where(deals['instrument_2'].notna() | deals['delivery_point_2'].notna(),
+                                        'Spread', 'Single')
+
+    profiles = get_delivery_profiles(deals['specific'])
+    for order in (1, 2):
+        periods = get_delivery_periods(deals[f'instrument_{order}'], deals['date'], CALENDAR)
+        if order == 1:
+            deals['product_type'] = periods['product_type']
+        deals[f'delivery_start_{order}'] = periods['delivery_start']
+        deals[f'delivery_end_{order}'] = periods['delivery_end']
+        deals[f'delivery_hours_{order}'] = get_delivery_hours(periods, profiles, CALENDAR)
+    deals['delivery_period_type'] = np.where(deals['product_type'].isin(SPOT_PRODUCT_TYPES), 'Spot', 'Forward')
+
+    loadable = (deals[['date', 'volume', 'price', 'commodity_type', 'delivery_point_1', 'currency', 'unit',
+                       'product_type', 'delivery_hours_1']].notna().all(axis=1)
+                & (deals['instrument_2'].isna() | deals['delivery_hours_2'].notna())
+                & (deals['instrument_2'].isna() | deals['delivery_point_2'].isna()))
+    if not loadable.all():
+        logger.warning('%s: %d deals skipped: unknown date, volume, price, delivery point or delivery period',
+                       in_name, (~loadable).sum())
+    return deals[loadable].reset_index(drop=True)
+
+
+def read_deals_file(in_content: bytes, in_path: Path) -> DataFrame:
+    """Читает файл экзиты и формирует сделки, см. `read_raw_file` и `read_deals`"""
+    return read_deals(read_raw_file(in_content, in_path), in_path.name)
+
+
+def _parse_file(in_path: Path, in_relative_path: str, in_reader: Callable[[bytes, Path], DataFrame],
+                in_parser: Callable[[DataFrame, str], DataFrame], in_known_hash: str | None) -> ParsedFile:
+    """Читает файл один раз, считает хэш его содержимого и разбирает его, если содержимое изменилось
+
+    Выполняется в процессе пула, поэтому `in_reader` и `in_parser` должны быть функциями уровня модуля.
+    """
+    stat = in_path.stat()
+    content = in_path.read_bytes()
+    sha256 = hashlib.sha256(content).hexdigest()
+    if sha256 == in_known_hash:
+        return ParsedFile(in_relative_path, stat.st_size, stat.st_mtime, sha256, None)
+    raw = in_reader(content, in_path)
+    return ParsedFile(in_relative_path, stat.st_size, stat.st_mtime, sha256, in_parser(raw, in_path.name),
+                      get_row_hashes(raw))
+
+
+class IngestionManager:
+    """Загружает в базу новые и измененные файлы экзиты
+
+    Файлы, размер и время изменения которых совпадают с манифестом, не читаются. Остальные файлы читаются
+    и разбираются в пуле процессов; если хэш содержимого совпадает с манифестом (файл перезаписан без
+    изменений), сделки не записываются повторно. У измененного файла записываются только сделки из строк,
+    дописанных после `rows_loaded` уже прочитанных, если те не изменились (см. `hash_rows`), иначе файл
+    не загружается. Строки считаются все, включая строки без загружаемых сделок, поэтому изменение такой строки
+    тоже обнаруживается.
+    Разобранные файлы по мере готовности передаются одному загрузчику `in_writer` в основном процессе,
+    каждый файл - в своей транзакции. Манифест сохраняется после фиксации каждой транзакции, поэтому
+    прерванная загрузка продолжается с первого незаписанного файла.
+
+    Attributes:
+        in_data_dir: папка с файлами экзиты
+        in_manifest_path: файл манифеста
+        in_reader: функция чтения содержимого файла в датафрейм строк, см. `read_raw_file`
+        in_parser: функция разбора строк файла в датафрейм сделок с колонкой 'row', см. `read_deals`
+        in_max_workers: количество процессов разбора, 1 - разбор в основном процессе
+        in_patterns: шаблоны имен загружаемых файлов
+    """
+
+    def __init__(self, in_data_dir: Path = DATA_DIR, in_manifest_path: Path = MANIFEST_FILE,
+                 in_reader: Callable[[bytes, Path], DataFrame] = read_raw_file,
+                 in_parser: Callable[[DataFrame, str], DataFrame] = read_deals,
+                 in_max_workers: int = INGESTION_MAX_WORKERS, in_patterns: tuple[str, ...] = DATA_FILE_PATTERNS):
+        self.data_dir = Path(in_data_dir)
+        self.manifest_path = Path(in_manifest_path)
+        self.reader = in_reader
+        self.parser = in_parser
+        self.max_workers = in_max_workers
+        self.patterns = in_patterns
+        self.manifest = self.load_manifest()
+        # файлы, которые не удалось разобрать или записать, вида {путь: текст ошибки}
+        self.failed = {}
+
+    def load_manifest(self) -> dict[str, ManifestEntry]:
+        """Читает манифест
+
+        Returns:
+            dict - записи манифеста по относительным путям файлов, пустой словарь, если манифеста нет
+        """
+        if not self.manifest_path.exists():
+            return {}
+        entries = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        return {entry['path']: ManifestEntry(**entry) for entry in entries}
+
+    def save_manifest(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        # запись во временный файл, чтобы прерванная загрузка не оставила поврежденный манифест
+        temp_path = self.manifest_path.with_name(f'{self.manifest_path.name}.{os.getpid()}.tmp')
+        temp_path.write_text(json.dumps([asdict(entry) for entry in self.manifest.values()], indent=1),
+                             encoding='utf-8')
+        os.replace(temp_path, self.manifest_path)
+
+    def find_files(self) -> list[Path]:
+        files = {path for pattern in self.patterns for path in self.data_dir.rglob(pattern) if path.is_file()}
+        # временные файлы excel ('~$...') открыты другими пользователями и не загружаются
+        return sorted(path for path in files if not path.name.startswith('~$'))
+
+    def get_pending_files(self) -> list[Path]:
+        """Отбирает файлы, размер или время изменения которых отличаются от манифеста
+
+        Returns:
+            list - файлы для чтения
+        """
+        pending = []
+        for path in self.find_files():
+            entry = self.manifest.get(path.relative_to(self.data_dir).as_posix())
+            stat = path.stat()
+            if entry is None or entry.size != stat.st_size or entry.mtime != stat.st_mtime:
+                pending.append(path)
+        return pending
+
+    def _get_job(self, in_path: Path) -> tuple:
+        """Формирует аргументы `_parse_file` для файла"""
+        relative_path = in_path.relative_to(self.data_dir).as_posix()
+        entry = self.manifest.get(relative_path)
+        return in_path, relative_path, self.reader, self.parser, entry and entry.sha256
+
+    def get_new_deals(self, in_parsed: ParsedFile) -> DataFrame:
+        """Отбирает сделки разобранного файла, которые еще не загружены
+
+        Returns:
+            DataFrame - сделки из строк после первых `rows_loaded` строк манифеста (все сделки нового файла)
+        """
+        entry = self.manifest.get(in_parsed.path)
+        if entry is None:
+            return in_parsed.deals
+        loaded = in_parsed.row_hashes[:entry.rows_loaded]
+        if len(loaded) < entry.rows_loaded or hash_rows(loaded) != entry.rows_hash:
+            # повторная загрузка продублировала бы сделки, а удалить прежние сделки файла нельзя
+            raise Exception(f'{in_parsed.path}: loaded rows were changed or removed, only appending is supported')
+        return in_parsed.deals[in_parsed.deals['row'] >= entry.rows_loaded]
+
+    def _record(self, in_parsed: ParsedFile, in_writer: Callable[[DataFrame], int],
+                in_transaction: Callable[[], AbstractContextManager]) -> int:
+        """Записывает новые сделки разобранного файла в отдельной транзакции и обновляет манифест
+
+        Returns:
+            int - количество записанных сделок
+        """
+        if in_parsed.deals is None:
+            # содержимое не изменилось: обновляются только размер и время изменения
+            entry = self.manifest[in_parsed.path]
+            entry.size, entry.mtime = in_parsed.size, in_parsed.mtime
+            written = 0
+        else:
+            deals = self.get_new_deals(in_parsed)
+            with in_transaction():
+                written = in_writer(deals) if not deals.empty else 0
+            self.manifest[in_parsed.path] = ManifestEntry(
+                in_parsed.path, in_parsed.size, in_parsed.mtime, in_parsed.sha256, len(in_parsed.row_hashes),
+                datetime.now().isoformat(), hash_rows(in_parsed.row_hashes))
+        self.save_manifest()
+        return written
+
+    def ingest(self, in_writer: Callable[[DataFrame], int],
+               in_transaction: Callable[[], AbstractContextManager] = nullcontext) -> int:
+        """Загружает новые и измененные файлы
+
+        Args:
+            in_writer: загрузчик сделок одного файла, возвращающий количество записанных строк
+                       (например, `DBLoaderDeals.bulk_insert_items`)
+            in_transaction: фабрика транзакции, в которой записывается один файл. Транзакция должна
+                            откатываться при ошибке, чтобы сессия загрузчика была пригодна для следующих
+                            файлов (например, `lambda: unit_of_work(session, None)`)
+        Returns:
+            int - количество записанных сделок. Файлы с ошибками перечислены в `failed`
+        """
+        self.failed = {}
+        pending = self.get_pending_files()
+        if not pending:
+            return 0
+        written = 0
+        if self.max_workers <= 1:
+            for path in pending:
+                try:
+                    written += self._record(_parse_file(*self._get_job(path)), in_writer, in_transaction)
+                except Exception as e:
+                    self.failed[path.relative_to(self.data_dir).as_posix()] = repr(e)
+            return written
+
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+            futures = {pool.submit(_parse_file, *self._get_job(path)): path for path in pending}
+            # пока загрузчик пишет один файл, остальные продолжают разбираться
+            for future in as_completed(futures):
+                try:
+                    written += self._record(future.result(), in_writer, in_transaction)
+                except Exception as e:
+                    self.failed[futures[future].relative_to(self.data_dir).as_posix()] = repr(e)
+        return written
+
+
+if __name__ == '__main__':
+    # загрузчики импортируются только в основном процессе, процессам пула они не нужны
+    from exxeta_loader import DBConnector, DBLoaderProducts, DBLoaderInstrument, DBLoaderDeals, DICTIONARY_LOADERS, \
+        preload_dictionaries, unit_of_work
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    connector = DBConnector()
+    base = connector.connect_to_base([
+        loader.table_name for loader in DICTIONARY_LOADERS + [DBLoaderProducts, DBLoaderInstrument, DBLoaderDeals]
+    ])
+    session = connector.create_session()
+    preload_dictionaries(base, session)
+    manager = IngestionManager()
+    # каждый файл - в своей транзакции: ошибка откатывает только его сделки
+    loaded = manager.ingest(DBLoaderDeals(base, session).bulk_insert_items, lambda: unit_of_work(session, None))
+    logger.info('%d deals loaded', loaded)
+    for failed_path, error in manager.failed.items():
+        logger.error('%s: %s', failed_path, error)
+
+    session.close()
+    connector.engine.dispose()
@@ -1,16 +1,23 @@
 from __future__ import annotations
 
+import hashlib
 import numpy as np
-from pandas import NaT, DataFrame
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import StringIO
+from pandas import NaT, DataFrame, Series, isna, concat
+from pandas.api.types import is_scalar
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from pathlib import Path
+from sqlalchemy import text, MetaData, PrimaryKeyConstraint, UniqueConstraint
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.automap import automap_base
 from sqlalchemy.orm import Session
-from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.dialects.postgresql import insert
 from exxeta_settings import CURRENCIES, DELIVERY_POINT_TYPES, UNITS
 from psycopg2.extensions import register_adapter, AsIs
-from config import DBConfigInstance, ANALYTICS_BASE_DB_CONFIG
+from config import DBConfigInstance, ANALYTICS_BASE_DB_CONFIG, SCHEMA_CACHE_DIR
+from db_common.engine import get_engine, reflect_metadata
 
 
 # действия по согласованию числовых форматов
@@ -38,13 +45,12 @@ class DBConnector:
         self.base = None
 
     def create_engine(self):
-        """Создает подключение к БД
+        """Создает подключение к БД (общее для процесса, см. `get_engine`)
 
         Returns:
             Engine: объект подключения engine
         """
-        self.engine = create_engine(
-            self._config, echo=False)
+        self.engine = get_engine(self._config)
         return self.engine
 
     def create_session(self):
@@ -56,17 +62,198 @@ class DBConnector:
         self.session = Session(bind=self.engine)
         return self.session
 
-    def connect_to_base(self):
+    def connect_to_base(self, in_tables: list | None = None, in_cache_dir: Path | None = SCHEMA_CACHE_DIR):
         """Отображает схему БД
 
+        Отражаются только таблицы `in_tables` (и таблицы, на которые они ссылаются), по умолчанию - все.
+        Отраженная схема сохраняется в `in_cache_dir` и используется повторно, пока не изменится
+        отпечаток схемы (см. `db_common.engine.SCHEMA_HASH_QUERY`).
+
+        Args:
+            in_tables: наименования таблиц для отражения
+            in_cache_dir: папка для кэша отраженной схемы, None отключает кэш
         Returns:
             AutomapBase: БД
         """
-        self.base = automap_base()
         self.create_engine()
-        self.base.prepare(self.engine, reflect=True)
+        self.base = automap_base(metadata=self.reflect_metadata(in_tables, in_cache_dir))
+        self.base.prepare()
         return self.base
 
+    def reflect_metadata(self, in_tables: list | None, in_cache_dir: Path | None) -> MetaData:
+        """Отражает таблицы БД или загружает их из кэша (см. `db_common.engine.reflect_metadata`)
+
+        Args:
+            in_tables: наименования таблиц для отражения, None - все таблицы
+            in_cache_dir: папка для кэша отраженной схемы, None отключает кэш
+        Returns:
+            MetaData: отраженные таблицы
+        """
+        return reflect_metadata(self.engine, in_tables, in_cache_dir)
+
+
+class DBIdCache:
+    """Ограниченный по размеру кэш id словарных записей в пределах процесса
+
+    Ключ - (имя таблицы, проверяемые колонки, значения проверяемых колонок), значение - id записи.
+    При переполнении вытесняются давно не использованные записи.
+
+    Attributes:
+        max_size (int): максимальное количество хранимых id
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._ids = OrderedDict()
+
+    @staticmethod
+    def make_key(in_table_name: str, in_check_column_name: list, in_value: dict) -> tuple:
+        """Формирует ключ кэша. Пропуски (None, NaN, NaT) приводятся к None, как и в `check_item`"""
+        values = tuple(None if _is_null(in_value.get(key)) else in_value[key] for key in in_check_column_name)
+        return in_table_name, tuple(in_check_column_name), values
+
+    def get(self, in_key: tuple) -> int | None:
+        value_id = self._ids.get(in_key)
+        if value_id is not None:
+            self._ids.move_to_end(in_key)
+        return value_id
+
+    def set(self, in_key: tuple, in_value_id: int) -> None:
+        self._ids[in_key] = in_value_id
+        self._ids.move_to_end(in_key)
+        if len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def clear(self) -> None:
+        self._ids.clear()
+
+    def preload(self, in_session, in_table, in_check_column_name: list) -> int:
+        """Загружает всю таблицу-словарь одним запросом
+
+        Args:
+            in_session: объект сессии в БД
+            in_table: объект-таблица из базы данных
+            in_check_column_name: колонки, по которым ведется поиск записей
+        Returns:
+            int - количество загруженных id
+        """
+        columns = [getattr(in_table, column) for column in in_check_column_name]
+        rows = in_session.query(in_table.id, *columns).all()
+        for row in rows:
+            value = dict(zip(in_check_column_name, row[1:]))
+            self.set(self.make_key(in_table.__table__.name, in_check_column_name, value), row[0])
+        return len(rows)
+
+
+# строковые представления значений, которые `check_item` ищет как `is Null`
+NULL_STRINGS = ('None', 'NaT', 'nan', 'NaN')
+
+
+def _is_null(in_value) -> bool:
+    """Проверяет, будет ли значение записано в `check_item` как `is Null`"""
+    return str(in_value) in NULL_STRINGS or (is_scalar(in_value) and isna(in_value))
+
+
+def _normalize_keys(in_values: DataFrame, in_columns: list) -> DataFrame:
+    """Приводит колонки к object и все виды пропусков к None, чтобы записи можно было сопоставлять через merge"""
+    result = DataFrame(index=in_values.index)
+    for column in in_columns:
+        values = in_values[column].astype(object)
+        is_null = values.isna() | values.astype(str).isin(NULL_STRINGS)
+        result[column] = values.where(~is_null, None)
+    return result
+
+
+# общий для всех загрузчиков кэш id словарных записей
+ID_CACHE = DBIdCache()
+
+# количество записанных строк, после которого `unit_of_work` фиксирует транзакцию
+UNIT_OF_WORK_BATCH_SIZE = 1000
+
+
+@contextmanager
+def unit_of_work(in_session, in_batch_size: int | None = UNIT_OF_WORK_BATCH_SIZE):
+    """Объединяет записи всех загрузчиков сессии в одну транзакцию
+
+    Внутри блока `DBLoader.commit` фиксирует транзакцию не после каждой записи, а после каждых
+    `in_batch_size` записанных строк (или только при выходе из блока, если `in_batch_size` = None).
+    Конфликты отдельных строк изолируются точками сохранения и не прерывают транзакцию.
+    При ошибке незафиксированные записи откатываются, а кэш id очищается, так как мог сохранить их id.
+
+    Args:
+        in_session: объект сессии в БД
+        in_batch_size: количество строк в одной транзакции
+    """
+    in_session.info['unit_of_work'] = {'batch_size': in_batch_size, 'pending': 0}
+    try:
+        yield in_session
+        in_session.commit()
+    except BaseException:
+        in_session.rollback()
+        ID_CACHE.clear()
+        raise
+    finally:
+        in_session.info.pop('unit_of_work', None)
+
+
+# наличие уникального ограничения по проверяемым колонкам: {(таблица, проверяемые колонки): bool}
+UNIQUE_CONSTRAINTS = {}
+
+
+def has_unique_constraint(in_table, in_check_column_name: list) -> bool:
+    """Проверяет, есть ли у таблицы уникальное ограничение (или уникальный индекс) ровно по проверяемым колонкам
+
+    Только при его наличии запись может выполняться через `INSERT ... ON CONFLICT (колонки)`.
+
+    Args:
+        in_table: объект-таблица из базы данных
+        in_check_column_name: колонки, по которым ведется поиск записей
+    Returns:
+        bool
+    """
+    table = in_table.__table__
+    key = (table.name, tuple(in_check_column_name))
+    if key not in UNIQUE_CONSTRAINTS:
+        unique_columns = [{column.name for column in constraint.columns} for constraint in table.constraints
+                          if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint))]
+        # частичные индексы не подходят для ON CONFLICT без условия
+        unique_columns += [{column.name for column in index.columns} for index in table.indexes
+                           if index.unique and index.dialect_options['postgresql'].get('where') is None]
+        UNIQUE_CONSTRAINTS[key] = set(in_check_column_name) in unique_columns
+    return UNIQUE_CONSTRAINTS[key]
+
+
+# запросы `check_item`: {(таблица, проверяемые колонки, колонки с пропусками): (имя, текст запроса)}
+CHECK_STATEMENTS = {}
+
+
+def get_check_statement(in_table_name: str, in_check_column_name: tuple, in_null_column_name: tuple) -> tuple:
+    """Возвращает параметризованный запрос поиска id записи
+
+    Для каждого сочетания таблицы, проверяемых колонок и колонок с пропусками запрос строится один раз:
+    колонки с пропусками проверяются через `is Null`, остальные - через параметры `$1`, `$2`, ...
+
+    Args:
+        in_table_name: наименование таблицы, в которой производится поиск
+        in_check_column_name: колонки, по которым ведется поиск
+        in_null_column_name: колонки, значения которых пропущены
+    Returns:
+        tuple - имя подготовленного запроса и текст запроса
+    """
+    key = (in_table_name, in_check_column_name, in_null_column_name)
+    if key not in CHECK_STATEMENTS:
+        conditions = []
+        n_params = 0
+        for column in in_check_column_name:
+            if column in in_null_column_name:
+                conditions.append(f"{column} is Null")
+            else:
+                n_params += 1
+                conditions.append(f"{column} = ${n_params}")
+        name = 'check_' + hashlib.md5(repr(key).encode()).hexdigest()[:16]
+        CHECK_STATEMENTS[key] = name, f"SELECT id FROM {in_table_name} WHERE {' AND '.join(conditions)}"
+    return CHECK_STATEMENTS[key]
+
 
 class DBLoader:
     """Базовый класс для загрузки данных в БД
@@ -83,7 +270,8 @@ class DBLoader:
     def check_item(self, in_value: dict[str, str], in_table: str, in_check_column_name: list | None) -> int | None:
         """Проверяет наличие записи в таблице.
 
-        Если находит запись value в таблице table, то возвращает id.
+        Если находит запись value в таблице table, то возвращает id. Поиск выполняется подготовленным
+        запросом (см. `get_check_statement`), поэтому БД не разбирает и не планирует его при каждом вызове.
 
         Args:
             in_value: dict - запись вида {'название_столбца': 'значение'}
@@ -92,20 +280,213 @@ class DBLoader:
         Returns:
             id: int - идентификатор записи или None (если такой записи нет)
         """
-        result_id = None
-        try:
-            text_string = ' AND '.join([f"{key} = '{in_value[key]}'" for key in
-                                        (in_value if in_check_column_name is None else in_check_column_name)])
-            text_string = text_string.replace("= 'None'", "is Null") \
-                .replace("= 'NaT'", "is Null") \
-                .replace("= 'nan'", "is Null") \
-                .replace("= 'NaN'", "is Null")
-            result = self.session.query(in_table).filter(text(text_string)).one()
-            result_id = result.id
-        except NoResultFound:
-            # print(f"{datetime.now()}| Value {in_value} is not '{in_table}'")
-            pass
-        return result_id
+        columns = tuple(in_value if in_check_column_name is None else in_check_column_name)
+        values = [in_value.get(column) for column in columns]
+        null_columns = tuple(column for column, value in zip(columns, values) if _is_null(value))
+        name, statement = get_check_statement(in_table.__table__.name, columns, null_columns)
+        # подготовленные запросы живут в пределах соединения с БД, поэтому их имена хранятся в info соединения
+        connection = self.session.connection()
+        prepared_statements = connection.info.setdefault('prepared_statements', set())
+        if name not in prepared_statements:
+            connection.exec_driver_sql(f"PREPARE {name} AS {statement}")
+            prepared_statements.add(name)
+        # значения передаются строками, как и в прежних текстовых фильтрах, приведение типов выполняет БД
+        params = tuple(str(value) for column, value in zip(columns, values) if column not in null_columns)
+        if params:
+            result = connection.exec_driver_sql(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            result = connection.exec_driver_sql(f"EXECUTE {name}")
+        row = result.one_or_none()
+        return None if row is None else row[0]
+
+    def bulk_check_items(self, in_values: DataFrame, in_table, in_check_column_name: list) -> Series:
+        """Проверяет наличие записей в таблице одним запросом.
+
+        Аналог `check_item` для всех строк `in_values` сразу.
+
+        Args:
+            in_values: датафрейм с проверяемыми колонками
+            in_table: таблица, в которой производится поиск
+            in_check_column_name: колонки, по которым ведется поиск
+        Returns:
+            Series - id записей (или <NA>, если записи нет) с индексом `in_values`
+        """
+        keys = _normalize_keys(in_values, in_check_column_name)
+        query = self.session.query(in_table.id, *[getattr(in_table, column) for column in in_check_column_name])
+        # сужаем выборку по первой колонке без пропусков
+        filter_column = next((column for column in in_check_column_name if keys[column].notna().all()), None)
+        if filter_column is not None:
+            query = query.filter(getattr(in_table, filter_column).in_(keys[filter_column].unique().tolist()))
+        existing = DataFrame(query.all(), columns=['id'] + in_check_column_name)
+        existing_keys = _normalize_keys(existing, in_check_column_name)
+        existing_keys['id'] = existing['id']
+        existing_keys = existing_keys.drop_duplicates(subset=in_check_column_name)
+        ids = keys.merge(existing_keys, on=in_check_column_name, how='left')['id']
+        return Series(ids.values, index=in_values.index).astype('Int64')
+
+    def upsert_item(self, in_value: dict, in_table, in_check_column_name: list) -> int:
+        """Записывает значения в таблицу и возвращает id записи одним запросом
+
+        Выполняет `INSERT ... ON CONFLICT (in_check_column_name) DO UPDATE ... RETURNING id`: при конфликте
+        по уникальному ограничению запись не изменяется, но ее id все равно возвращается. Требует уникального
+        ограничения по `in_check_column_name` (см. `has_unique_constraint`) и значений без пропусков.
+
+        Args:
+            in_value: строка (словарь) с данными для записи
+            in_table: таблица для записи
+            in_check_column_name: колонки уникального ограничения
+        Returns:
+            value_id (int) - id записи
+        """
+        statement = insert(in_table).values({**in_value, 'update_time': self.get_current_datetime()})
+        statement = statement.on_conflict_do_update(
+            index_elements=in_check_column_name,
+            set_={in_check_column_name[0]: statement.excluded[in_check_column_name[0]]}
+        ).returning(in_table.id)
+        value_id = self.session.execute(statement).scalar_one()
+        self.commit()
+        return value_id
+
+    def bulk_upsert_items(self, in_values: DataFrame, in_table, in_check_column_name: list) -> Series:
+        """Записывает строки в таблицу и возвращает их id одним запросом
+
+        Аналог `upsert_item` для всех строк `in_values` сразу. Строки с одинаковыми значениями
+        `in_check_column_name` записываются один раз (по первой встретившейся строке).
+
+        Args:
+            in_values: датафрейм со значениями для записи
+            in_table: таблица для записи
+            in_check_column_name: колонки уникального ограничения
+        Returns:
+            Series - id записей с индексом `in_values`
+        """
+        keys = _normalize_keys(in_values, list(in_values.columns))
+        # ON CONFLICT DO UPDATE не может изменить одну строку дважды за запрос
+        distinct = keys.drop_duplicates(subset=in_check_column_name)
+        distinct['update_time'] = self.get_current_datetime()
+        statement = insert(in_table).values(distinct.to_dict('records'))
+        statement = statement.on_conflict_do_update(
+            index_elements=in_check_column_name,
+            set_={in_check_column_name[0]: statement.excluded[in_check_column_name[0]]}
+        ).returning(in_table.id, *[getattr(in_table, column) for column in in_check_column_name])
+        returned = DataFrame(self.session.execute(statement).all(), columns=['id'] + in_check_column_name)
+        self.commit(len(distinct))
+        existing = _normalize_keys(returned, in_check_column_name)
+        existing['id'] = returned['id']
+        ids = keys[in_check_column_name].merge(existing, on=in_check_column_name, how='left')['id']
+        return Series(ids.values, index=in_values.index).astype('Int64')
+
+    def bulk_insert_dict_items(self, in_values: DataFrame, in_table, in_check_column_name: list) -> Series:
+        """Записывает недостающие записи в таблицу-словарь и возвращает id для всех строк `in_values`.
+
+        Аналог `insert_item` для всех строк `in_values` сразу: id уникальных записей сначала ищутся в ID_CACHE
+        (в том числе заполненном `preload_dictionaries`), и только для отсутствующих в нем записей, если у таблицы
+        есть уникальное ограничение по `in_check_column_name`, выполняется один `bulk_upsert_items`, иначе один
+        запрос на поиск существующих записей, один INSERT для новых и один запрос на получение их id. Найденные
+        id сохраняются в ID_CACHE. Колонки `in_values`, не входящие в `in_check_column_name`, записываются
+        для новых записей по первой встретившейся строке.
+
+        Args:
+            in_values: датафрейм со значениями для записи
+            in_table: таблица для записи
+            in_check_column_name: колонки, по которым ведется поиск похожих записей
+        Returns:
+            Series - id записей с индексом `in_values`
+        """
+        values = _normalize_keys(in_values, list(in_values.columns))
+        distinct = values.drop_duplicates(subset=in_check_column_name).reset_index(drop=True)
+        table_name = in_table.__table__.name
+        cache_keys = [ID_CACHE.make_key(table_name, in_check_column_name, value)
+                      for value in distinct[in_check_column_name].to_dict('records')]
+        distinct['id'] = Series([ID_CACHE.get(key) for key in cache_keys], dtype='Int64')
+        is_uncached = distinct['id'].isna()
+        if is_uncached.any():
+            distinct.loc[is_uncached, 'id'] = self._bulk_resolve_dict_items(
+                distinct[is_uncached].drop(columns='id'), in_table, in_check_column_name)
+            for key, value_id in zip(cache_keys, distinct['id']):
+                if not isna(value_id):
+                    ID_CACHE.set(key, int(value_id))
+        ids = values[in_check_column_name].merge(distinct[in_check_column_name + ['id']],
+                                                 on=in_check_column_name, how='left')['id']
+        return Series(ids.values, index=in_values.index).astype('Int64')
+
+    def _bulk_resolve_dict_items(self, in_distinct: DataFrame, in_table, in_check_column_name: list) -> Series:
+        """Находит или записывает уникальные записи `in_distinct` в БД, см. `bulk_insert_dict_items`"""
+        distinct = in_distinct.copy()
+        # пропуски не конфликтуют по уникальному ограничению, поэтому такие строки записываются через поиск
+        if has_unique_constraint(in_table, in_check_column_name) \
+                and distinct[in_check_column_name].notna().all(axis=None):
+            return self.bulk_upsert_items(distinct, in_table, in_check_column_name)
+        ids = self.bulk_check_items(distinct, in_table, in_check_column_name)
+        missing = distinct[ids.isna()]
+        if not missing.empty:
+            missing = missing.assign(update_time=self.get_current_datetime())
+            self.session.execute(insert(in_table).values(missing.to_dict('records')).on_conflict_do_nothing())
+            self.commit(len(missing))
+            ids = self.bulk_check_items(distinct, in_table, in_check_column_name)
+        return ids
+
+    def copy_items(self, in_values: DataFrame, in_table_name: str, in_merge: bool = False,
+                   in_conflict_column_name: list | None = None, n_rows: int | None = None,
+                   in_has_unique_index: bool = True) -> int:
+        """Записывает датафрейм в таблицу через `COPY FROM STDIN`
+
+        Данные передаются в PostgreSQL одним CSV-потоком в рамках текущей транзакции сессии, что на порядок
+        быстрее построчных INSERT. Если `in_merge` = True, данные сначала копируются во временную таблицу,
+        а затем переносятся в `in_table_name` одним `INSERT ... SELECT ... ON CONFLICT`: при заданном
+        `in_conflict_column_name` существующие записи обновляются, иначе конфликтующие строки пропускаются.
+        Если уникального индекса по `in_conflict_column_name` нет (`in_has_unique_index` = False), то
+        существующие записи обновляются одним UPDATE, а остальные записываются одним INSERT ... WHERE NOT EXISTS.
+
+        Args:
+            in_values: датафрейм для записи, названия колонок совпадают с колонками таблицы
+            in_table_name: наименование таблицы для записи
+            in_merge: записывать через временную таблицу с учетом уникальных ограничений
+            in_conflict_column_name: колонки уникального ограничения для обновления существующих записей
+            n_rows: количество строк в одном COPY, по умолчанию все строки разом
+            in_has_unique_index: есть ли у таблицы уникальный индекс по `in_conflict_column_name`
+        Returns:
+            int - количество записанных строк
+        """
+        columns = ', '.join(f'"{column}"' for column in in_values.columns)
+        target_table = f'tmp_{in_table_name}' if in_merge else in_table_name
+        cursor = self.session.connection().connection.cursor()
+        if in_merge:
+            cursor.execute(f'CREATE TEMP TABLE IF NOT EXISTS {target_table} ON COMMIT DROP AS '
+                           f'SELECT {columns} FROM {in_table_name} WITH NO DATA')
+        written = 0
+        n_rows = n_rows or max(len(in_values), 1)
+        for chunk_start in range(0, len(in_values), n_rows):
+            buffer = StringIO()
+            in_values.iloc[chunk_start:chunk_start + n_rows].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {target_table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+            written += cursor.rowcount
+        if in_merge and in_conflict_column_name and not in_has_unique_index:
+            match = ' AND '.join(f't."{column}" = s."{column}"' for column in in_conflict_column_name)
+            update_columns = ', '.join(f'"{column}" = s."{column}"' for column in in_values.columns
+                                       if column not in in_conflict_column_name)
+            cursor.execute(f'UPDATE {in_table_name} t SET {update_columns} FROM {target_table} s WHERE {match}')
+            written = cursor.rowcount
+            cursor.execute(f'INSERT INTO {in_table_name} ({columns}) SELECT {columns} FROM {target_table} s '
+                           f'WHERE NOT EXISTS (SELECT 1 FROM {in_table_name} t WHERE {match})')
+            written += cursor.rowcount
+            cursor.execute(f'DROP TABLE {target_table}')
+        elif in_merge:
+            if in_conflict_column_name:
+                conflict_columns = ', '.join(f'"{column}"' for column in in_conflict_column_name)
+                update_columns = ', '.join(f'"{column}" = EXCLUDED."{column}"' for column in in_values.columns
+                                           if column not in in_conflict_column_name)
+                on_conflict = f'ON CONFLICT ({conflict_columns}) DO UPDATE SET {update_columns}'
+            else:
+                on_conflict = 'ON CONFLICT DO NOTHING'
+            cursor.execute(f'INSERT INTO {in_table_name} ({columns}) SELECT {columns} FROM {target_table} '
+                           f'{on_conflict}')
+            written = cursor.rowcount
+            cursor.execute(f'DROP TABLE {target_table}')
+        cursor.close()
+        self.commit(written)
+        return written
 
     def get_id_for_new_item(self, in_table):
         """Генерирует id для новой записи в таблице
@@ -129,6 +510,40 @@ class DBLoader:
         self.session.commit()
         return value_id
 
+    def commit(self, in_n_rows: int = 1) -> None:
+        """Фиксирует транзакцию после записи `in_n_rows` строк
+
+        Внутри `unit_of_work` транзакция фиксируется только на границе пачки.
+        """
+        unit = self.session.info.get('unit_of_work')
+        if unit is None:
+            self.session.commit()
+            return
+        unit['pending'] += in_n_rows
+        if unit['batch_size'] is not None and unit['pending'] >= unit['batch_size']:
+            self.session.commit()
+            unit['pending'] = 0
+
+    def execute_item(self, in_statement) -> None:
+        """Выполняет запись одной строки
+
+        Внутри `unit_of_work` запись выполняется в точке сохранения: при конфликте откатывается
+        только она, а транзакция пачки продолжается.
+        """
+        if self.session.info.get('unit_of_work') is None:
+            try:
+                self.session.execute(in_statement)
+                self.session.commit()
+            except IntegrityError:
+                self.session.rollback()
+            return
+        try:
+            with self.session.begin_nested():
+                self.session.execute(in_statement)
+        except IntegrityError:
+            return
+        self.commit()
+
     @staticmethod
     def get_current_datetime():
         """Получаем текущие дату и время для записи в `update_time`"""
@@ -148,6 +563,18 @@ class DBLoader:
         Returns:
             value_id (int) - id добавленной записи
         """
+        # кэшируются только словарные записи, то есть записи с явно заданными проверяемыми колонками
+        cache_key = None
+        if in_check_column_name is not None:
+            cache_key = ID_CACHE.make_key(in_table.__table__.name, in_check_column_name, in_value)
+            value_id = ID_CACHE.get(cache_key)
+            if value_id is not None:
+                return value_id
+            if has_unique_constraint(in_table, in_check_column_name) \
+                    and not any(_is_null(in_value.get(column)) for column in in_check_column_name):
+                value_id = self.upsert_item(in_value, in_table, in_check_column_name)
+                ID_CACHE.set(cache_key, value_id)
+                return value_id
         # если записи еще нет в таблице, то check_item вернет None
         value_id = self.check_item(in_value, in_table, in_check_column_name)
         if value_id is None:
@@ -159,12 +586,10 @@ class DBLoader:
             # [setattr(new_item, key, in_value[key]) for key in in_value]
             # self.session.add(new_item) # старая версия с полной блокировкой таблицы
             v_inserted_values = insert(in_table).values(in_value)
-            try:  # проверим, будут ли конфликты
-                self.session.execute(v_inserted_values)
-                self.session.commit()  # проверим, будут ли конфликты
-            except:  # проверим, будут ли конфликты
-                self.session.rollback()  # проверим, будут ли конфликты
+            self.execute_item(v_inserted_values)
             value_id = self.check_item(in_value, in_table, in_check_column_name)  # проверим, будут ли конфликты
+        if cache_key is not None and value_id is not None:
+            ID_CACHE.set(cache_key, value_id)
         return value_id
 
 
@@ -201,6 +626,17 @@ class DBLoaderDeliveryPointType(DBLoader):
         value_id = DBLoader(self.base, self.session).insert_item(in_value, in_table, [self.check_column_name])
         return value_id
 
+    def bulk_insert_items(self, in_values: Series) -> Series:
+        """Записывает значения в таблицу разом
+
+        Args:
+            in_values: значения для записи
+        Returns:
+            Series - id записей с индексом `in_values`
+        """
+        in_values = DataFrame({self.check_column_name: in_values})
+        return self.bulk_insert_dict_items(in_values, self.table, [self.check_column_name])
+
 
 class DBLoaderDeliveryPoint(DBLoaderDeliveryPointType):
     """Класс для загрузки данных в таблицу `delivery_point_dict`
@@ -235,6 +671,23 @@ class DBLoaderDeliveryPoint(DBLoaderDeliveryPointType):
         value_id = DBLoader(self.base, self.session).insert_item(in_value, in_table, [self.check_column_name])
         return value_id
 
+    def bulk_insert_items(self, in_values: DataFrame) -> Series:
+        """Записывает значения в таблицу разом
+
+        Args:
+            in_values: датафрейм с колонками point_name и point_type
+        Returns:
+            Series - id записей с индексом `in_values`
+        """
+        point_types = in_values['point_type'].map(DELIVERY_POINT_TYPES)
+        if point_types.isna().any():
+            raise KeyError(f"unknown point types {set(in_values['point_type'][point_types.isna()])}")
+        in_values = DataFrame({
+            self.check_column_name: in_values['point_name'],
+            'id_type': DBLoaderDeliveryPointType(self.base, self.session).bulk_insert_items(point_types)
+        })
+        return self.bulk_insert_dict_items(in_values, self.table, [self.check_column_name])
+
 
 class DBLoaderCurrency(DBLoaderDeliveryPointType):
     """Класс для загрузки данных в таблицу `currencies_dict`.
@@ -360,6 +813,38 @@ class DBLoaderProducts(DBLoaderDeliveryPointType):
         value_id = DBLoader(*params).insert_item(value, in_table, self.check_column_name)
         return value_id
 
+    def bulk_insert_items(self, in_products: DataFrame) -> Series:
+        """Записывает значения в таблицу разом
+
+        Аналог `insert_item` для всех продуктов датафрейма: каждый словарь продукта разрешается
+        несколькими запросами на все уникальные значения сразу.
+
+        Args:
+            in_products: датафрейм с колонками point_name, point_type, currency, unit, market, product_type,
+                         beg_date, end_date, product_name и comment (см. `Deal.get_products_frame`)
+        Returns:
+            Series - id записей с индексом `in_products`
+        """
+        columns = list(in_products.columns)
+        products = _normalize_keys(in_products, columns)
+        distinct = products.drop_duplicates().reset_index(drop=True)
+        params = (self.base, self.session)
+        values = DataFrame({
+            'id_delivery_point': DBLoaderDeliveryPoint(*params).bulk_insert_items(
+                distinct[['point_name', 'point_type']]),
+            'id_currency': DBLoaderCurrency(*params).bulk_insert_items(distinct['currency']),
+            'id_unit': DBLoaderUnit(*params).bulk_insert_items(distinct['unit']),
+            'id_market': DBLoaderMarket(*params).bulk_insert_items(distinct['market']),
+            'id_product_type': DBLoaderProductType(*params).bulk_insert_items(distinct['product_type']),
+            'code': distinct['product_name'],
+            'comment': distinct['comment'].where(distinct['market'] == 'Natural Gas', 'Incorrect delivery period'),
+            'beg_date': distinct['beg_date'],
+            'end_date': distinct['end_date'].where(distinct['beg_date'].notna(), None)
+        })
+        distinct['id'] = self.bulk_insert_dict_items(values, self.table, self.check_column_name)
+        ids = products.merge(distinct, on=columns, how='left')['id']
+        return Series(ids.values, index=in_products.index).astype('Int64')
+
 
 class DBLoaderInstrumentType(DBLoaderDeliveryPointType):
     """Класс для загрузки данных в таблицу `instrument_types_dict`
@@ -414,8 +899,93 @@ class DBLoaderInstrument(DBLoaderDeliveryPointType):
         value_id = DBLoader(*params).insert_item(value, in_table, self.check_column_name)
         return value_id
 
+    def bulk_insert_items(self, in_products_1: DataFrame, in_products_2: DataFrame,
+                          in_instrument_types: Series) -> Series:
+        """Записывает значения в таблицу разом
+
+        Args:
+            in_products_1: датафрейм с первыми продуктами сделок (см. `Deal.get_products_frame`)
+            in_products_2: датафрейм со вторыми продуктами только для тех сделок, у которых они есть
+            in_instrument_types: наименования типов инструментов ('Single' или 'Spread')
+        Returns:
+            Series - id записей с индексом `in_products_1`
+        """
+        params = (self.base, self.session)
+        # оба продукта разрешаются одним проходом по словарям
+        product_ids = DBLoaderProducts(*params).bulk_insert_items(
+            concat([in_products_1, in_products_2], keys=[1, 2]))
+        values = DataFrame({
+            'id_product_1': product_ids.loc[1],
+            'id_product_2': product_ids.loc[2].reindex(in_products_1.index) if not in_products_2.empty else None,
+            'id_instrument_type': DBLoaderInstrumentType(*params).bulk_insert_items(in_instrument_types)
+        }, index=in_products_1.index)
+        return self.bulk_insert_dict_items(values, self.table, self.check_column_name)
+
+
+# загрузчики небольших таблиц-словарей, которые целиком загружаются в кэш id при старте
+DICTIONARY_LOADERS = [
+    DBLoaderDeliveryPointType, DBLoaderDeliveryPoint, DBLoaderCurrency, DBLoaderUnit,
+    DBLoaderMarket, DBLoaderProductType, DBLoaderInstrumentType
+]
+
+
+def preload_dictionaries(in_base, in_session, in_loaders: list | None = None) -> int:
+    """Заполняет кэш id содержимым небольших таблиц-словарей, по одному запросу на таблицу
+
+    Кэш читают и построчный `DBLoader.insert_item`, и пакетный `DBLoader.bulk_insert_dict_items`, поэтому
+    после предзагрузки записи этих словарей не запрашиваются из БД.
+
+    Args:
+        in_base: БД
+        in_session: объект сессии в БД
+        in_loaders: классы загрузчиков словарей, по умолчанию DICTIONARY_LOADERS
+    Returns:
+        int - количество загруженных id
+    """
+    loaded = 0
+    for loader_class in (DICTIONARY_LOADERS if in_loaders is None else in_loaders):
+        loader = loader_class(in_base, in_session)
+        loaded += ID_CACHE.preload(in_session, loader.table, [loader.check_column_name])
+    return loaded
+
+
+class Record:
+    """Базовый класс компактной записи о строке датафрейма
+
+    Значения хранятся в слотах (`__slots__`) без словаря экземпляра, поэтому запись занимает в несколько раз
+    меньше памяти. Заполняются только поля `fields`, остальные колонки строки пропускаются. Записи нужны только
+    для построчной загрузки (`insert_item`): пакетная загрузка записи не создает и работает с колонками
+    датафрейма целиком (см. `Deal.get_products_frame`, `Price.get_products_frame`).
+
+    Attributes:
+        fields: наименования полей, заполняемых из строки датафрейма
+    """
+    __slots__ = ()
+    fields = ()
+
+    def __init__(self, in_data_row: dict):
+        self._set_fields(in_data_row.items())
+
+    def _set_fields(self, in_items) -> None:
+        """Заполняет поля записи
+
+        Args:
+            in_items: пары (наименование колонки, значение)
+        """
+        for name, value in in_items:
+            if name in self.fields:
+                setattr(self, name, value)
+
+    def _complete(self) -> None:
+        """Вычисляет производные поля после заполнения записи"""
 
-class Deal:
+    def __str__(self):
+        return '\n'.join(f"{item}: {getattr(self, item, None)}" for item in self.__slots__)
+
+    __repr__ = __str__
+
+
+class Deal(Record):
     """Класс для преобразования словаря с информацией по конкретной сделке.
 
     Экземпляр класса формирует необходимые для загрузки в БД поля, получив на вход информацию о сделке.
@@ -423,11 +993,19 @@ class Deal:
     Attributes:
         in_data_row: словарь со всей информацией по конкретной сделке
     """
+    # для того, чтобы свободно пользоваться отдельными значениями (например, чтобы узнать цену,
+    # обратившись к соответствующему атрибуту по имени: self.price), описывающими сделки
+    fields = ('date', 'contract', 'volume', 'price', 'venue', 'instrument_type', 'commodity_type', 'currency',
+              'unit', 'product_type', 'specific', 'delivery_period_type', 'delivery_point_1', 'delivery_point_2',
+              'instrument_1', 'instrument_2', 'delivery_start_1', 'delivery_start_2', 'delivery_end_1',
+              'delivery_end_2', 'delivery_hours_1', 'delivery_hours_2')
+    __slots__ = fields + ('product_1', 'product_2')
 
     def __init__(self, in_data_row: dict):
-        # для того, чтобы свободно пользоваться отдельными значениями (например, чтобы узнать цену,
-        # обратившись к соответствующему атрибуту по имени: self.price), описывающими сделки
-        self.__dict__.update(in_data_row)
+        super().__init__(in_data_row)
+        self._complete()
+
+    def _complete(self) -> None:
         # для более удобной загрузки продуктов и инструмента впоследствии
         self.product_1 = self._get_product()
         self.product_2 = self._get_product(order=2)
@@ -503,16 +1081,56 @@ class Deal:
 
         return product
 
-    def __str__(self):
-        result = []
-        for item in self.__dir__():
-            if not item.startswith('_'):
-                result.append(f"{item}: {getattr(self, item)}")
-            else:
-                continue
-        return '\n'.join(result)
+    @staticmethod
+    def get_products_frame(in_deals_df: DataFrame, order: int = 1) -> DataFrame:
+        """Векторный аналог `_get_product` для всех сделок датафрейма
 
-    __repr__ = __str__
+        Args:
+            in_deals_df: датафрейм со сделками
+            order: порядковый номер продукта. Может принимать значения 1 (по умолчанию) и 2
+        Returns:
+            DataFrame - продукты с колонками point_name, point_type, currency, unit, market, product_type,
+                        beg_date, end_date, product_name и comment. При order=2 - только для тех сделок,
+                        у которых есть второй продукт
+        """
+        assert order in (1, 2), "Аргумент 'order' должен быть равен 1 или 2"
+        deals = in_deals_df
+        comment = ('Delivery for ' + deals['delivery_hours_1'].astype(int).astype(str)
+                   + ' hours (' + deals['delivery_period_type'].astype(str) + ')')
+        products = DataFrame({
+            'point_name': deals['delivery_point_1'], 'point_type': deals['commodity_type'],
+            'currency': deals['currency'], 'unit': deals['unit'],
+            'market': deals['commodity_type'], 'product_type': deals['product_type'],
+            'beg_date': deals['delivery_start_1'],
+            'end_date': deals['delivery_end_1'],
+            'product_name': deals['instrument_1'].where(deals['specific'] == '',
+                                                        deals['specific'] + deals['instrument_1']),
+            'comment': comment
+        })
+        if order == 1:
+            return products
+
+        no_point_2 = deals['delivery_point_2'].isna() | (deals['delivery_point_2'] == 'nan')
+        no_instrument_2 = deals['instrument_2'].isna() | (deals['instrument_2'] == 'nan')
+        if (~no_point_2 & ~no_instrument_2).any():
+            raise TypeError('both delivery_point_2 and instrument_2 are set for '
+                            f'{(~no_point_2 & ~no_instrument_2).sum()} deals')
+        # второй пункт поставки без второго инструмента, см. `_get_product`
+        point_2 = ~no_point_2 & no_instrument_2
+        points = deals.loc[point_2, 'delivery_point_2']
+        products.loc[point_2, 'point_name'] = points
+        products.loc[point_2, 'currency'] = points.map(CURRENCIES)
+        products.loc[point_2, 'unit'] = points.map(UNITS)
+        # второй инструмент без второго пункта поставки, см. `_get_product`
+        instrument_2 = no_point_2 & ~no_instrument_2
+        spreads = deals[instrument_2]
+        products.loc[instrument_2, 'beg_date'] = spreads['delivery_start_2']
+        products.loc[instrument_2, 'end_date'] = spreads['delivery_end_2']
+        products.loc[instrument_2, 'product_name'] = spreads['instrument_2'].where(
+            spreads['specific'] == '', spreads['specific'] + spreads['instrument_2'])
+        products.loc[instrument_2, 'comment'] = ('Delivery for ' + np.round(spreads['delivery_hours_2']).astype(str)
+                                                 + ' hours (' + spreads['delivery_period_type'].astype(str) + ')')
+        return products[point_2 | instrument_2]
 
 
 class DBLoaderDeals(DBLoaderDeliveryPointType):
@@ -561,30 +1179,42 @@ class DBLoaderDeals(DBLoaderDeliveryPointType):
         value_id = DBLoader(*params).insert_item(value, in_table)
         return value_id
 
-    def bulk_insert_items(self, in_deals_df: DataFrame, n_rows=None):
+    def bulk_insert_items(self, in_deals_df: DataFrame, n_rows=None) -> int:
         """Записывает значения в таблицу
 
         Отличается от `insert_item` тем, что загружает все сделки, хранимые в датафрейме `in_deals_df` разом
-        либо партиями по `n_rows` строк.
+        либо партиями по `n_rows` строк через `COPY FROM STDIN` (см. `copy_items`). Словари (пункты поставки,
+        валюты, продукты, инструменты и тд) разрешаются для всех уникальных значений сразу, а не построчно.
 
         Args:
             in_deals_df: датафрейм со сделками для загрузки
             n_rows: количество загружаемых за раз сделок в БД
+        Returns:
+            int - количество записанных сделок
         """
-        deal_list = []
-        for deal_index, row in in_deals_df.iterrows():
-            deal = Deal(row.to_dict())
-            value = self._get_deals_value(deal)
-            value.update({'update_time': self.get_current_datetime()})
-            deal_list.append(value)
+        params = (self.base, self.session)
+        deals = in_deals_df
+        # пересчет объемов аналогичен `_get_deals_value`
+        volume = deals['volume'].where(~deals['delivery_point_1'].isin(['PEG', 'Peg Nord', 'AOC']),
+                                       deals['volume'] / 24)
+        volume = volume.where(~deals['delivery_point_1'].isin(['NBP', 'IBP', 'ZEE']), volume * 1000 / 24)
+        data_frame = DataFrame({
+            'id_instrument': DBLoaderInstrument(*params).bulk_insert_items(
+                Deal.get_products_frame(deals), Deal.get_products_frame(deals, order=2), deals['instrument_type']),
+            'id_market': DBLoaderMarket(*params).bulk_insert_items(deals['commodity_type']),
+            'deal_datetime': deals['date'],
+            'deal_contract': deals['contract'],
+            'volume': volume,
+            'price': deals['price'],
+            'venue': deals['venue'],
+            'update_time': self.get_current_datetime()
+        })
         # так как pandas не особо запотится о сохранности последовательности id, то
         # перед каждой загрузкой партии сделок сиквенции задается верное значение
         text_string = (f"CREATE SEQUENCE IF NOT EXISTS \"{self.table_name}_id_seq\";\n"
                        f"SELECT setval('{self.table_name}_id_seq', "
                        f"COALESCE((SELECT MAX(id)+1 FROM {self.table_name}), 1), FALSE);")
-        self.session.execute(text_string)
+        self.session.execute(text(text_string))
 
-        data_frame = DataFrame(deal_list)
-        data_frame.to_sql(self.table_name, DBConnector().create_engine(), chunksize=n_rows, if_exists='append',
-                          index=False)
+        return self.copy_items(data_frame, self.table_name, n_rows=n_rows)
 
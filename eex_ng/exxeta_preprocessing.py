@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import re
+import numpy as np
+import pandas as pd
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pandas import DataFrame, Series, factorize
+from exxeta_settings import PARSER_PATTERNS, PARSER_PATTERNS_SPECIFIC, DELIVERY_POINTS_ASSOCIATIONS, \
+    DELIVERY_POINTS_CORRECT, EXCHANGES
+from trading_calendar import TradingCalendar
+
+"""
+Предобработка экзитовских спецификаций сделок (колонка 'Contract'): разбор продуктов, специфичных дополнений,
+товара, пунктов поставки, площадки и периодов поставки.
+Каждая уникальная спецификация разбирается один раз, повторяющиеся берутся из кэша
+"""
+
+# неименованная группа: открывающая скобка без экранирования, за которой не следует '?'
+_UNNAMED_GROUP = re.compile(r'(?<!\\)\((?!\?)')
+
+
+def _name_groups(in_pattern: str, in_prefix: str) -> tuple[str, list[str]]:
+    """Переименовывает неименованные группы шаблона, чтобы его можно было встроить в общее регулярное выражение
+
+    Args:
+        in_pattern: регулярное выражение из PARSER_PATTERNS
+        in_prefix: префикс имен групп, уникальный в пределах общего выражения
+    Returns:
+        tuple - выражение с именованными группами и имена этих групп по порядку
+    """
+    names = []
+
+    def rename(_):
+        names.append(f'{in_prefix}_{len(names)}')
+        return f'(?P<{names[-1]}>'
+
+    return _UNNAMED_GROUP.sub(rename, in_pattern), names
+
+
+class DistinctValueParser(ABC):
+    """Базовый класс разбора колонки спецификаций сделок
+
+    Каждая уникальная спецификация разбирается один раз (см. `_extract`), результаты хранятся в кэше
+    и для повторяющихся спецификаций берутся из него.
+
+    Attributes:
+        columns: колонки результата разбора
+    """
+    columns = []
+
+    def __init__(self):
+        self._cache = {}
+
+    @abstractmethod
+    def _extract(self, in_contracts: Series) -> DataFrame:
+        """Разбирает спецификации без обращения к кэшу
+
+        Returns:
+            DataFrame - колонки `columns` с индексом `in_contracts`
+        """
+        pass
+
+    def parse(self, in_contracts: Series) -> DataFrame:
+        """Разбирает спецификации сделок
+
+        Args:
+            in_contracts: колонка 'Contract'
+        Returns:
+            DataFrame - колонки `columns` (NaN, если значение не найдено) с индексом `in_contracts`
+        """
+        # пропуски получают код -1 и попадают на последнюю, пустую строку таблицы результатов
+        codes, distinct = factorize(in_contracts)
+        distinct = Series(distinct, dtype=object).astype(str)
+        new = distinct[~distinct.map(self._cache.__contains__)]
+        if not new.empty:
+            parsed = self._extract(new.reset_index(drop=True))
+            self._cache.update(zip(new, parsed[self.columns].itertuples(index=False, name=None)))
+        results = DataFrame([*map(self._cache.__getitem__, distinct), (np.nan,) * len(self.columns)],
+                            columns=self.columns, dtype=object)
+        return results.iloc[codes].set_axis(in_contracts.index)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def _first_valid(in_groups: DataFrame) -> Series:
+    """Возвращает для каждой строки первую непустую группу
+
+    Вложенные группы идут раньше всего совпадения. Колонки перебираются с конца, чтобы не транспонировать
+    таблицу объектов, как это делает `bfill(axis=1)`.
+
+    Args:
+        in_groups: значения групп в порядке приоритета
+
+    Returns:
+        Series первых непустых значений
+    """
+    result = in_groups.iloc[:, -1]
+    for column in reversed(in_groups.columns[:-1]):
+        result = in_groups[column].where(in_groups[column].notna(), result)
+    return result
+
+
+class ContractParser(DistinctValueParser):
+    """Разбирает спецификации сделок по упорядоченной коллекции шаблонов
+
+    Для каждой спецификации выбирается первый по порядку элемент коллекции, `pattern` которого встречается
+    в спецификации. Продукт извлекается выражением `instrument` (или самим `pattern`, если `instrument` не задан):
+    берется первая участвующая в совпадении группа, а если групп нет - все совпадение. Второй продукт (спреды) -
+    следующее совпадение того же выражения правее первого.
+
+    Все элементы коллекции объединяются в одно выражение: альтернативу из опережающих проверок, привязанных
+    к началу строки, поэтому порядок элементов сохраняется, а разбор всей колонки выполняется одним
+    `Series.str.extract`.
+
+    Attributes:
+        in_patterns: коллекция вида PARSER_PATTERNS
+        in_spread: искать ли второй продукт
+        in_flags: флаги регулярных выражений
+    """
+    columns = ['first', 'second']
+
+    def __init__(self, in_patterns: tuple[dict, ...], in_spread: bool = True, in_flags: int = re.IGNORECASE):
+        super().__init__()
+        self.spread = in_spread
+        self._groups = []
+        branches = []
+        for i, item in enumerate(in_patterns):
+            instrument = item.get('instrument', item['pattern'])
+            first, first_groups = _name_groups(instrument, f'a{i}')
+            extract = f'(?P<a{i}>{first})'
+            if in_spread:
+                second, second_groups = _name_groups(instrument, f'b{i}')
+                extract += f'(?:.*?(?P<b{i}>{second}))?'
+            else:
+                second_groups = []
+            # пустая группа m{i} отмечает выбранный элемент коллекции, извлечение продукта необязательно
+            branches.append(f'(?=.*?(?:{item["pattern"]}))(?P<m{i}>)(?:(?=.*?{extract}))?')
+            self._groups.append((f'm{i}', [*first_groups, f'a{i}'], [*second_groups, f'b{i}']))
+        self.pattern = re.compile('^(?:' + '|'.join(branches) + ')', in_flags | re.DOTALL)
+
+    def _extract(self, in_contracts: Series) -> DataFrame:
+        matches = in_contracts.str.extract(self.pattern)
+        first = Series(np.nan, index=in_contracts.index, dtype=object)
+        second = Series(np.nan, index=in_contracts.index, dtype=object)
+        for marker, first_groups, second_groups in self._groups:
+            chosen = matches[marker].notna()
+            if not chosen.any():
+                continue
+            first[chosen] = _first_valid(matches.loc[chosen, first_groups])
+            if self.spread:
+                second[chosen] = _first_valid(matches.loc[chosen, second_groups])
+        return DataFrame({'first': first, 'second': second})
+
+
+class DeliveryPointClassifier(DistinctValueParser):
+    """Определяет товар и пункты поставки по спецификациям сделок
+
+    Все списки пунктов поставки из `in_associations` объединяются в одно выражение, в котором каждому товару
+    соответствует именованная группа, и вся колонка просматривается одним `Series.str.extractall`.
+    Товар - первый по порядку `in_associations`, пункты поставки которого встречаются в спецификации;
+    пункты поставки - первые два различных найденных пункта этого товара слева направо. Наименования пунктов
+    приводятся к виду базы данных по `in_corrections` без учета регистра.
+
+    Attributes:
+        in_associations: коллекция вида DELIVERY_POINTS_ASSOCIATIONS
+        in_corrections: словарь вида DELIVERY_POINTS_CORRECT
+    """
+    columns = ['commodity_type', 'delivery_point_1', 'delivery_point_2']
+
+    def __init__(self, in_associations: list[tuple[list, str]], in_corrections: dict[str, str]):
+        super().__init__()
+        self.commodities = [commodity for _, commodity in in_associations]
+        self.corrections = {name.lower(): correct_name for name, correct_name in in_corrections.items()}
+        # при совпадении в одной позиции альтернативы проверяются по порядку, поэтому приоритет товаров сохраняется
+        self.pattern = re.compile('|'.join(
+            f'(?P<c{i}>' + '|'.join(f'(?:{point})' for point in points) + ')'
+            for i, (points, _) in enumerate(in_associations)
+        ))
+
+    def _extract(self, in_contracts: Series) -> DataFrame:
+        result = DataFrame(np.nan, index=in_contracts.index, columns=self.columns, dtype=object)
+        # одна строка на каждый найденный пункт поставки: номер спецификации, номер товара, наименование
+        matches = in_contracts.str.extractall(self.pattern)
+        matches = matches.rename_axis(['row', 'match']).reset_index().melt(
+            id_vars=['row', 'match'], var_name='group', value_name='point').dropna(subset=['point'])
+        if matches.empty:
+            return result
+        matches = matches.sort_values(['row', 'match'])
+        matches['commodity'] = matches['group'].str[1:].astype(int)
+        matches = matches[matches['commodity'] == matches.groupby('row')['commodity'].transform('min')]
+        matches['point'] = [self.corrections.get(point.lower(), point) for point in matches['point']]
+        matches = matches.drop_duplicates(['row', 'point'])
+        matches['order'] = matches.groupby('row').cumcount()
+        points = matches[matches['order'] < 2].pivot(index='row', columns='order', values='point')
+        commodities = matches.groupby('row')['commodity'].first()
+        result.loc[commodities.index, 'commodity_type'] = [self.commodities[i] for i in commodities]
+        result.loc[points.index, 'delivery_point_1'] = points[0]
+        if 1 in points:
+            result.loc[points.index, 'delivery_point_2'] = points[1]
+        return result
+
+
+# разбор продуктов, специфичных дополнений ('Base', 'Peak', 'WD 5+6' и тд) и пунктов поставки
+INSTRUMENT_PARSER = ContractParser(PARSER_PATTERNS)
+SPECIFIC_PARSER = ContractParser(PARSER_PATTERNS_SPECIFIC, in_spread=False)
+DELIVERY_POINT_CLASSIFIER = DeliveryPointClassifier(DELIVERY_POINTS_ASSOCIATIONS, DELIVERY_POINTS_CORRECT)
+
+
+def parse_contracts(in_contracts: Series) -> DataFrame:
+    """Разбирает продукты и специфичные дополнения всех спецификаций сделок разом
+
+    Args:
+        in_contracts: колонка 'Contract'
+    Returns:
+        DataFrame - колонки 'instrument_1', 'instrument_2' (NaN, если продукта нет, как ожидает `Deal`) и 'specific'
+                    ('' при отсутствии дополнения, см. `Deal._get_specific_instrument_name`) с индексом `in_contracts`
+    """
+    instruments = INSTRUMENT_PARSER.parse(in_contracts)
+    specific = SPECIFIC_PARSER.parse(in_contracts)['first']
+    return DataFrame({
+        'instrument_1': instruments['first'],
+        'instrument_2': instruments['second'],
+        'specific': specific.where(specific.notna(), '')
+    }, index=in_contracts.index)
+
+
+def classify_contracts(in_contracts: Series) -> DataFrame:
+    """Определяет товар и пункты поставки всех спецификаций сделок разом
+
+    Args:
+        in_contracts: колонка 'Contract'
+    Returns:
+        DataFrame - колонки 'commodity_type', 'delivery_point_1' и 'delivery_point_2' (NaN, если значение
+                    не найдено) с индексом `in_contracts`
+    """
+    return DELIVERY_POINT_CLASSIFIER.parse(in_contracts)
+
+
+# площадки из EXCHANGES в спецификации сделки: биржевая сделка, иначе - внебиржевая
+_EXCHANGE = re.compile(r'\b(?:' + '|'.join(re.escape(exchange) for exchange in EXCHANGES) + r')\b')
+
+
+def classify_venues(in_contracts: Series) -> Series:
+    """Относит сделки к площадке по спецификациям
+
+    Args:
+        in_contracts: колонка 'Contract'
+    Returns:
+        Series - 'Exchange' или 'OTC' с индексом `in_contracts`
+    """
+    is_exchange = in_contracts.astype(str).str.contains(_EXCHANGE)
+    return Series(np.where(is_exchange, 'Exchange', 'OTC'), index=in_contracts.index)
+
+
+def get_delivery_profiles(in_specific: Series) -> Series:
+    """Определяет профиль поставки по специфичным дополнениям ('Base', 'Peak', 'Off-Peak' и тд)
+
+    Args:
+        in_specific: колонка 'specific', см. `parse_contracts`
+    Returns:
+        Series - 'base', 'peak' или 'offpeak' (см. `TradingCalendar.get_delivery_hours`) с индексом `in_specific`
+    """
+    specific = in_specific.fillna('').astype(str).str.lower().str.replace('-', '', regex=False)
+    return specific.map({'peak': 'peak', 'offpeak': 'offpeak'}).fillna('base')
+
+
+def _fixed_period(in_product_type: str, in_start: datetime, in_end: datetime) -> tuple:
+    return in_product_type, pd.Timestamp(in_start), pd.Timestamp(in_end)
+
+
+def _month_period(in_month: str, in_year: str) -> tuple:
+    start = pd.Timestamp(datetime.strptime(f'{in_month.title()}{in_year}', '%b%y'))
+    return _fixed_period('Month', start, start + pd.offsets.MonthEnd(0))
+
+
+def _quarter_period(in_quarter: str, in_year: str) -> tuple:
+    start = pd.Timestamp(2000 + int(in_year), 3 * int(in_quarter) - 2, 1)
+    return _fixed_period('Quarter', start, start + pd.offsets.QuarterEnd(0))
+
+
+def _week_period(in_week: str, in_year: str) -> tuple:
+    start = pd.Timestamp(datetime.strptime(f'{in_year}-W{in_week}-1', '%G-W%V-%u'))
+    return _fixed_period('Week', start, start + pd.Timedelta(days=6))
+
+
+def _weekend_period(in_first_day: str, in_last_day: str, in_month: str, in_year: str) -> tuple:
+    start = pd.Timestamp(int(in_year), int(in_month), int(in_first_day))
+    end = start.replace(day=int(in_last_day))
+    # выходные на стыке месяцев: последний день - в следующем месяце
+    return _fixed_period('Weekend', start, end if end >= start else end + pd.offsets.MonthBegin(1))
+
+
+# продукты с фиксированным периодом поставки (см. PARSER_PATTERNS): выражение для всего продукта
+# и функция, возвращающая по группам совпадения (тип продукта, начало поставки, конец поставки)
+FIXED_PERIODS = (
+    (r'D(\d{2})\W(\d{2})\W(\d{4})',
+     lambda day, month, year: _fixed_period('Day', datetime(int(year), int(month), int(day)),
+                                            datetime(int(year), int(month), int(day)))),
+    (r'WE(\d{2})\W(\d{2})\W(\d{2})\W(\d{4})', _weekend_period),
+    (r'W(\d{2})\s(\d{4})', _week_period),
+    (r'([A-Z]{3})(\d{2})', _month_period),
+    (r'Q(\d)\D(\d{2})', _quarter_period),
+    (r'WIN\s(\d{4})\W(\d{4})',
+     lambda first, second: _fixed_period('Season', datetime(int(first), 10, 1), datetime(int(second), 3, 31))),
+    (r'SUM\s(\d{4})',
+     lambda year: _fixed_period('Season', datetime(int(year), 4, 1), datetime(int(year), 9, 30))),
+    (r'GAS\s+YEARS?\s+(\d{2})\W(\d{2})',
+     lambda first, second: _fixed_period('Gas Year', datetime(2000 + int(first), 10, 1),
+                                         datetime(2000 + int(second), 9, 30))),
+    (r'(\d{4})', lambda year: _fixed_period('Year', datetime(int(year), 1, 1), datetime(int(year), 12, 31))),
+)
+FIXED_PERIODS = tuple((re.compile(pattern, re.IGNORECASE), get_period) for pattern, get_period in FIXED_PERIODS)
+
+# продукты, период поставки которых отсчитывается от даты сделки: {продукт: тип периода}, см.
+# `TradingCalendar.get_delivery_window` ('Day' - продукт 'Prompt Day'). 'Saturday' и 'Sunday' - ближайшие
+# суббота и воскресенье
+RELATIVE_PERIODS = {'DAY': 'Day', 'BOM': 'BOM', 'BOW': 'BOW', 'W END': 'Weekend', 'W-END': 'Weekend',
+                    'W/END': 'Weekend', 'SATURDAY': 'Saturday', 'SUNDAY': 'Sunday'}
+
+# типы продуктов с поставкой в пределах текущего месяца, остальные - форварды
+SPOT_PRODUCT_TYPES = ('Day', 'Weekend', 'BOW', 'BOM')
+
+
+def _get_fixed_period(in_instrument: str) -> tuple:
+    for pattern, get_period in FIXED_PERIODS:
+        match = pattern.fullmatch(in_instrument)
+        if match is not None:
+            try:
+                return get_period(*match.groups())
+            except ValueError:
+                # например, 'ABC24' - не месяц
+                continue
+    return np.nan, pd.NaT, pd.NaT
+
+
+def get_delivery_periods(in_instruments: Series, in_trade_dates: Series, in_calendar: TradingCalendar) -> DataFrame:
+    """Определяет тип продукта и период поставки
+
+    Фиксированные периоды (дни, недели, месяцы, кварталы, сезоны, годы, см. FIXED_PERIODS) разбираются один раз
+    для каждого уникального продукта, периоды, отсчитываемые от даты сделки (см. RELATIVE_PERIODS),
+    рассчитываются календарем для всей колонки разом.
+
+    Args:
+        in_instruments: колонка 'instrument_1' или 'instrument_2', см. `parse_contracts`
+        in_trade_dates: даты сделок
+        in_calendar: календарь торговых дней
+    Returns:
+        DataFrame - колонки 'product_type', 'delivery_start' и 'delivery_end' (включительно) с индексом
+                    `in_instruments`. Для неизвестных продуктов - NaN и NaT
+    """
+    instruments = in_instruments.where(in_instruments.notna(), None).astype(object)
+    instruments = instruments.map(lambda instrument: None if instrument is None else str(instrument).strip().upper())
+    distinct = instruments.dropna().unique()
+    fixed = DataFrame([_get_fixed_period(instrument) for instrument in distinct], index=distinct,
+                      columns=['product_type', 'delivery_start', 'delivery_end'])
+    periods = fixed.reindex(instruments.fillna('')).set_axis(in_instruments.index)
+    periods['delivery_start'] = pd.to_datetime(periods['delivery_start'])
+    periods['delivery_end'] = pd.to_datetime(periods['delivery_end'])
+
+    relative = instruments.map(RELATIVE_PERIODS)
+    trade_dates = pd.to_datetime(in_trade_dates).dt.normalize()
+    is_window = relative.isin(['Day', 'BOM', 'BOW', 'Weekend'])
+    if is_window.any():
+        start, end = in_calendar.get_delivery_window(trade_dates[is_window], relative[is_window])
+        periods.loc[is_window, 'delivery_start'] = start
+        periods.loc[is_window, 'delivery_end'] = end
+        periods.loc[is_window, 'product_type'] = relative[is_window]
+    for weekday, name in ((5, 'Saturday'), (6, 'Sunday')):
+        is_day = relative == name
+        if is_day.any():
+            # ближайший такой день строго после даты сделки
+            days = (weekday - trade_dates[is_day].dt.weekday - 1) % 7 + 1
+            periods.loc[is_day, 'delivery_start'] = trade_dates[is_day] + pd.to_timedelta(days, unit='D')
+            periods.loc[is_day, 'delivery_end'] = periods.loc[is_day, 'delivery_start']
+            periods.loc[is_day, 'product_type'] = 'Day'
+    return periods
+
+
+def get_delivery_hours(in_periods: DataFrame, in_profiles: Series, in_calendar: TradingCalendar) -> Series:
+    """Считает часы поставки по периодам поставки и профилям
+
+    Args:
+        in_periods: периоды поставки, см. `get_delivery_periods`
+        in_profiles: профили поставки, см. `get_delivery_profiles`
+        in_calendar: календарь торговых дней
+    Returns:
+        Series - часы поставки (NaN, если период неизвестен) с индексом `in_periods`
+    """
+    hours = Series(np.nan, index=in_periods.index)
+    for profile in in_profiles.unique():
+        is_profile = in_profiles == profile
+        hours[is_profile] = in_calendar.get_delivery_hours(in_periods.loc[is_profile, 'delivery_start'],
+                                                           in_periods.loc[is_profile, 'delivery_end'], profile)
+    return hours
@@ -127,10 +127,25 @@ HOLIDAY = [
 
 BASE_DIR = Path.cwd()
 
+# файл с выходными днями в формате CSV без заголовка (колонки: дата YYYY-MM-DD, наименование выходного;
+# строки, начинающиеся с '#', - комментарии), лежит рядом с модулем.
+# Если файла нет, используется HOLIDAY, см. trading_calendar.TradingCalendar.from_file
+HOLIDAY_FILE = Path(__file__).resolve().parent / 'holidays.csv'
+
 # путь к папке с данными экзиты, которые необходимо загрузить в базу
 # DATA_DIR = Path.home() / 'Desktop' / 'exxeta'
 DATA_DIR = Path('/', 'mnt', 'teamdocs_ns', 'TRD_Exchange', '')
 
+# файлы экзиты в DATA_DIR (поиск рекурсивный), которые загружаются в базу.
+# Старый формат '*.xls' не загружается: для его чтения pandas нужен xlrd
+DATA_FILE_PATTERNS = ('*.xlsx', '*.csv')
+
+# манифест загруженных файлов экзиты, см. exxeta_ingestion.IngestionManager
+MANIFEST_FILE = BASE_DIR / 'exxeta_manifest.json'
+
+# количество процессов, одновременно разбирающих файлы экзиты
+INGESTION_MAX_WORKERS = 4
+
 # наименование колонок с основной информацией
 MAIN_COLUMNS = ['Date/Time', 'Contract', 'Qty', 'Price']
 
@@ -0,0 +1,113 @@
+import threading
+import time
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from eex_ng import http_client
+from eex_ng.response_cache import ResponseCache
+
+
+class RateLimiter:
+    """
+    Spaces out requests to the same host by at least 1 / requests_per_second seconds
+    """
+
+    def __init__(self, requests_per_second: float = None):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self._lock = threading.Lock()
+        self._next_time = {}
+
+    def wait(self, host: str):
+        """
+        blocks until the next request to the host is allowed
+        """
+        with self._lock:
+            now = time.monotonic()
+            start_time = max(now, self._next_time.get(host, now))
+            self._next_time[host] = start_time + self.interval
+        if start_time > now:
+            time.sleep(start_time - now)
+
+
+class ConcurrentFetcher:
+    """
+    Makes GET requests to the EEX webservice over the shared http_client Session in a bounded thread pool
+    with per-host rate limiting and retries with exponential backoff.
+    The limits hold across all calls of the instance, so parsers running in parallel should share one fetcher.
+    If cache is set, responses are read from it first and successful responses are saved to it
+    """
+
+    # responses with these statuses are retried, other non 2xx statuses raise immediately
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_workers: int = 8, requests_per_second: float = 10, retries: int = 3,
+                 backoff: float = 1.0, timeout=http_client.TIMEOUT, cache: ResponseCache = None):
+        """
+        :param max_workers: max number of simultaneous requests of all fetch_all calls together,
+                            1 makes requests sequential
+        :param requests_per_second: max rate of requests to the same host, None disables the limit
+        :param retries: number of retries after the first failed attempt
+        :param backoff: delay before the first retry in seconds, doubled for every next retry
+        :param timeout: timeout of a single request in seconds, float or (connect, read) tuple
+        :param cache: on-disk response cache, None disables caching
+        """
+        self.max_workers = max_workers
+        # bounds requests of concurrent fetch_all calls, each of them runs its own thread pool
+        self._request_slots = threading.BoundedSemaphore(max(max_workers, 1))
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+
+    def get(self, url: str, params: dict, headers: dict) -> bytes:
+        """
+        makes request and returns response content, decoding is left to the caller
+        """
+        if self.cache is not None:
+            content = self.cache.get(url, params)
+            if content is not None:
+                return content
+        host = urlparse(url).netloc
+        for attempt in range(self.retries + 1):
+            try:
+                with self._request_slots:
+                    self.rate_limiter.wait(host)
+                    r = http_client.get(url, params=params, headers=headers, timeout=self.timeout)
+                if r.status_code not in self.retry_statuses:
+                    r.raise_for_status()
+                    if self.cache is not None:
+                        self.cache.set(url, params, r.content)
+                    return r.content
+                error = requests.HTTPError(f'{r.status_code} response from {host}', response=r)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.retries:
+                raise error
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def fetch_all(self, url: str, params_list: list[dict], headers: dict) -> list[bytes]:
+        """
+        makes requests concurrently, responses are returned in the order of params_list
+        """
+        if self.max_workers <= 1:
+            return [self.get(url, params, headers) for params in params_list]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(lambda params: self.get(url, params, headers), params_list))
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_default_fetcher() -> ConcurrentFetcher:
+    """
+    :return: process-wide fetcher with the on-disk response cache, shared by parsers created without a fetcher,
+             so that they share its concurrency and rate limits and the size accounting of the cache
+    """
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = ConcurrentFetcher(cache=ResponseCache())
+    return _default_fetcher
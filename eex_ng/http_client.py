@@ -0,0 +1,37 @@
+import threading
+import requests
+
+from requests.adapters import HTTPAdapter
+
+# number of hosts with kept-alive connections
+POOL_CONNECTIONS = 4
+# max number of kept-alive connections per host, should not be less than ConcurrentFetcher.max_workers
+POOL_MAXSIZE = 16
+# timeout of a single request in seconds: (connect, read)
+TIMEOUT = (10, 30)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    :return: process-wide Session with pooled keep-alive connections, shared by all parsers
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+            _session = session
+    return _session
+
+
+def get(url: str, params: dict = None, headers: dict = None, timeout=TIMEOUT) -> requests.Response:
+    """
+    makes GET request using the shared Session
+    """
+    return get_session().get(url, params=params, headers=headers, timeout=timeout)
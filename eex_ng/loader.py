@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-from datetime import timedelta
+from datetime import date, timedelta
 
 import pandas
-from tqdm import tqdm
 from exxeta_loader import *
 from eex_ng.eex_ng_futures_parser import EexNaturalGasFuturesParser
 from eex_ng.eex_ng_indices_parser import EexNaturalGasIndicesParser
 from eex_ng.eex_ng_spot_parser import EexNaturalGasSpotParser
+from eex_ng.fetcher import ConcurrentFetcher
+from eex_ng.response_cache import ResponseCache
 from snam.db_config import DBConfig, DBConfigInstance
 from psycopg2.extensions import register_adapter
 
@@ -28,10 +29,30 @@ Whole code except __main__ is referred from eex_loader.loader.py
 register_adapter(np.float64, addapt_numpy_float64)
 register_adapter(np.int64, addapt_numpy_int64)
 
+# id источника EEX в prices_curve_dict
+EEX_SOURCE_ID = 9
+# глубина загрузки, если в базе еще нет ни одной кривой источника
+DEFAULT_DAYS_BACK = 3
+# сколько дней до последней загруженной даты перезагружается для учета поздних корректировок
+OVERLAP_DAYS = 3
+# типы продуктов кривых без даты начала поставки, которые загружает каждый парсер. Кривые с датой начала
+# поставки загружает парсер фьючерсов
+PARSER_PRODUCT_TYPES = {
+    EexNaturalGasIndicesParser: ('Daily', 'Monthly'),
+    EexNaturalGasSpotParser: ('Day',),
+}
+
+
+class Price(Record):
+    fields = ('date', 'prices_name', 'price', 'hub', 'unit', 'currency', 'price_type', 'products', 'id_source',
+              'beg_date', 'end_date', 'product_type')
+    __slots__ = fields + ('product_1',)
 
-class Price:
     def __init__(self, in_data_row: dict):
-        self.__dict__.update(in_data_row)
+        super().__init__(in_data_row)
+        self._complete()
+
+    def _complete(self) -> None:
         self.product_1 = self._get_product()
 
     def _get_product(self):
@@ -48,16 +69,23 @@ class Price:
         }
         return product
 
-    def __str__(self):
-        result = []
-        for item in self.__dir__():
-            if not item.startswith('_'):
-                result.append(f"{item}: {getattr(self, item)}")
-            else:
-                continue
-        return '\n'.join(result)
-
-    __repr__ = __str__
+    @staticmethod
+    def get_products_frame(in_prices_df: DataFrame) -> DataFrame:
+        """Векторный аналог `_get_product` для всех цен датафрейма
+
+        Args:
+            in_prices_df: датафрейм с выдачей парсеров (колонки PandasConfigurator)
+        Returns:
+            DataFrame - продукты с колонками point_name, point_type, currency, unit, market, product_type,
+                        beg_date, end_date, product_name и comment (см. `DBLoaderProducts.bulk_insert_items`)
+        """
+        return DataFrame({
+            'point_name': in_prices_df['hub'], 'point_type': 'Natural Gas',
+            'currency': in_prices_df['currency'], 'unit': in_prices_df['unit'],
+            'market': 'Natural Gas', 'product_type': in_prices_df['product_type'],
+            'beg_date': in_prices_df['beg_date'], 'end_date': in_prices_df['end_date'],
+            'product_name': in_prices_df['products'], 'comment': 'm_aleksandrov'
+        }, index=in_prices_df.index)
 
 
 class DBLoaderPricesType(DBLoaderDeliveryPointType):
@@ -90,6 +118,27 @@ class DBLoaderPriceCurveDict(DBLoaderDeliveryPointType):
         value_id = DBLoader(*params).insert_item(value, in_table, self.check_column_name)
         return value_id
 
+    def bulk_insert_items(self, in_curves: DataFrame) -> Series:
+        """Записывает значения в таблицу разом
+
+        Аналог `insert_item` для всех кривых датафрейма: инструменты, продукты и типы цен разрешаются
+        несколькими запросами на все уникальные значения сразу.
+
+        Args:
+            in_curves: датафрейм с колонками `DBLoaderCurves.curve_key_columns`
+        Returns:
+            Series - id записей с индексом `in_curves`
+        """
+        params = (self.base, self.session)
+        products = Price.get_products_frame(in_curves)
+        values = DataFrame({
+            'id_source': in_curves['id_source'],
+            'id_instrument': DBLoaderInstrument(*params).bulk_insert_items(
+                products, products.iloc[:0], Series('Single', index=in_curves.index)),
+            'id_type': DBLoaderPricesType(*params).bulk_insert_items(in_curves['price_type'])
+        }, index=in_curves.index)
+        return self.bulk_insert_dict_items(values, self.table, self.check_column_name)
+
 
 class DBLoaderCurvesDict(DBLoaderDeliveryPointType):
     table_name = 'curves_dict'
@@ -112,22 +161,54 @@ class DBLoaderCurvesDict(DBLoaderDeliveryPointType):
         value_id = DBLoader(*params).insert_item(value, in_table, self.check_column_name)
         return value_id
 
+    def bulk_insert_items(self, in_curves: DataFrame) -> Series:
+        """Записывает значения в таблицу разом
+
+        Args:
+            in_curves: датафрейм с колонками `DBLoaderCurves.curve_key_columns`
+        Returns:
+            Series - id записей с индексом `in_curves`
+        """
+        values = DataFrame({
+            'id_sector': 1,  # 'forward prices'
+            'time_period': 1,  # 'THICK'
+            'id_prices_curves': DBLoaderPriceCurveDict(self.base, self.session).bulk_insert_items(in_curves)
+        }, index=in_curves.index)
+        return self.bulk_insert_dict_items(values, self.table, self.check_column_name)
+
+
+class DuplicateCurvesError(Exception):
+    """В таблице `curves` есть повторяющиеся пары (id_curve, date), уникальный индекс не может быть создан"""
+
 
 class DBLoaderCurves(DBLoaderDeliveryPointType):
     table_name = 'curves'
 
+    # колонки выдачи парсеров, однозначно определяющие кривую (id_curve)
+    curve_key_columns = [
+        'hub', 'currency', 'unit', 'product_type', 'beg_date', 'end_date', 'products', 'price_type', 'id_source'
+    ]
+
+    # колонки уникального индекса таблицы `curves`, по которому отсекаются дубликаты в `bulk_insert_items`
+    unique_column_name = ['id_curve', 'date']
+    # DDL уникального индекса, см. `create_unique_index`
+    unique_index_ddl = 'CREATE UNIQUE INDEX IF NOT EXISTS curves_id_curve_date_key ON curves (id_curve, date)'
+
     def __init__(self, in_base, in_session):
         super().__init__(in_base, in_session)
         self.table = self._get_table()
 
-    def _get_curves_value(self, in_curve: Price) -> dict:
+    def _get_id_curve(self, in_curve: Price) -> int:
         params = (self.base, self.session)
+        return DBLoaderCurvesDict(*params).insert_item({
+            'product_1': in_curve.product_1,
+            'price_type': in_curve.price_type,
+            'id_source': in_curve.id_source
+        })
+
+    def _get_curves_value(self, in_curve: Price) -> dict:
         value = {
-            'id_curve': DBLoaderCurvesDict(*params).insert_item({
-                'product_1': in_curve.product_1,
-                'price_type': in_curve.price_type,
-                'id_source': in_curve.id_source
-            }),
+            'id_curve': self._get_id_curve(in_curve),
             'date': in_curve.date,
             'value': in_curve.price
         }
@@ -141,6 +222,88 @@ class DBLoaderCurves(DBLoaderDeliveryPointType):
 
         return value_id
 
+    def create_unique_index(self) -> None:
+        """Создает уникальный индекс `curves` по `unique_column_name`, если его еще нет
+
+        С индексом `bulk_insert_items` записывает значения одним `INSERT ... ON CONFLICT`. Индекс строится
+        по всей таблице с ее блокировкой на запись, поэтому создается явно, а не при загрузке.
+
+        Raises:
+            DuplicateCurvesError: в таблице уже есть повторяющиеся значения кривых за одну дату
+        """
+        try:
+            self.session.execute(text(self.unique_index_ddl))
+            self.session.commit()
+        except IntegrityError as e:
+            self.session.rollback()
+            raise DuplicateCurvesError(f"Table '{self.table_name}' has duplicate {self.unique_column_name}, "
+                                       f"remove them before creating the unique index") from e
+        UNIQUE_CONSTRAINTS[(self.table_name, tuple(self.unique_column_name))] = True
+
+    def get_curve_states(self, in_id_source: int) -> DataFrame:
+        """Возвращает последнюю загруженную дату, тип продукта и дату начала поставки по каждой кривой источника
+
+        Args:
+            in_id_source: id источника в prices_curve_dict
+        Returns:
+            DataFrame - колонки id_curve, last_date, product_type и beg_date
+        """
+        text_string = ("SELECT c.id_curve, MAX(c.date), pt.product_type, p.beg_date FROM curves c "
+                       "JOIN curves_dict cd ON cd.id = c.id_curve "
+                       "JOIN prices_curve_dict pcd ON pcd.id = cd.id_prices_curves "
+                       "JOIN instruments_dict i ON i.id = pcd.id_instrument "
+                       "JOIN products_dict p ON p.id = i.id_product_1 "
+                       "JOIN product_types_dict pt ON pt.id = p.id_product_type "
+                       "WHERE pcd.id_source = :id_source GROUP BY c.id_curve, pt.product_type, p.beg_date")
+        rows = self.session.execute(text(text_string), {'id_source': in_id_source}).all()
+        return DataFrame(rows, columns=['id_curve', 'last_date', 'product_type', 'beg_date'])
+
+    def bulk_insert_items(self, in_prices_df: DataFrame, n_rows: int | None = None,
+                          in_last_dates: dict[int, datetime] | None = None,
+                          in_overlap: timedelta = timedelta(0)) -> int:
+        """Записывает значения в таблицу
+
+        Отличается от `insert_item` тем, что словарные id определяются для всех уникальных кривых разом
+        (см. `DBLoaderCurvesDict.bulk_insert_items`), а не для каждой строки `in_prices_df`, а сами значения
+        копируются во временную таблицу через `COPY FROM STDIN` пачками по `n_rows` строк и переносятся
+        в `curves` одним `INSERT ... ON CONFLICT (id_curve, date) DO UPDATE`: уже загруженные значения
+        (например, в окне перезагрузки `in_overlap`) обновляются поздними корректировками. Конфликты
+        определяются уникальным индексом таблицы `curves` по `unique_column_name` (см. `create_unique_index`).
+        Без индекса уже загруженные значения обновляются одним UPDATE, а новые записываются одним
+        `INSERT ... WHERE NOT EXISTS` (см. `copy_items`).
+
+        Если задан `in_last_dates`, то по каждой кривой записываются только значения позже
+        ее последней загруженной даты за вычетом `in_overlap`.
+
+        Args:
+            in_prices_df: датафрейм с выдачей парсеров (колонки PandasConfigurator)
+            n_rows: количество строк в одном COPY
+            in_last_dates: словарь вида {id_curve: последняя дата}, см. `get_curve_states`
+            in_overlap: окно перезагрузки для поздних корректировок
+        Returns:
+            int - количество записанных строк
+        """
+        prices_df = in_prices_df.dropna(subset=['price'])
+        if prices_df.empty:
+            return 0
+
+        # все уникальные кривые проходят по цепочке словарей разом
+        curves_df = prices_df[self.curve_key_columns].drop_duplicates().reset_index(drop=True)
+        curves_df['id_curve'] = DBLoaderCurvesDict(self.base, self.session).bulk_insert_items(curves_df)
+
+        values_df = prices_df.merge(curves_df, on=self.curve_key_columns, how='left')
+        values_df = values_df[['id_curve', 'date', 'price']].rename(columns={'price': 'value'})
+        # ON CONFLICT DO UPDATE не может изменить одну строку дважды за запрос
+        values_df = values_df.drop_duplicates(subset=self.unique_column_name, keep='last')
+        if in_last_dates:
+            last_dates = pandas.to_datetime(values_df['id_curve'].map(in_last_dates))
+            values_df = values_df[last_dates.isna() | (values_df['date'] > last_dates - in_overlap)]
+        values_df['update_time'] = self.get_current_datetime()
+
+        return self.copy_items(values_df, self.table_name, in_merge=True,
+                               in_conflict_column_name=self.unique_column_name, n_rows=n_rows,
+                               in_has_unique_index=has_unique_constraint(self.table, self.unique_column_name))
+
 
 def clean_prices(price: str | datetime) -> float:
     """Очищает цены от значений со сбившимся форматоми"""
@@ -157,24 +320,99 @@ def clean_prices(price: str | datetime) -> float:
     return correct_price
 
 
-if __name__ == '__main__':
-    futures = EexNaturalGasFuturesParser(end_date=datetime.today(),
-                                         start_date=(datetime.today() - timedelta(days=3))).parse()
-    indices = EexNaturalGasIndicesParser(end_date=datetime.today(),
-                                         start_date=datetime.today() - timedelta(days=3)).parse()
-    spots = EexNaturalGasSpotParser(end_date=datetime.today(),
-                                    start_date=datetime.today() - timedelta(days=3)).parse()
+def get_start_dates(in_curve_states: DataFrame, in_end_date: datetime, in_overlap: timedelta) -> dict[type, datetime]:
+    """Рассчитывает дату начала парсинга для каждого парсера
+
+    Парсер начинает с самой ранней из последних загруженных дат своих кривых за вычетом `in_overlap`,
+    поэтому отставшие кривые (новый хаб, сбой парсера) догружаются. Кривые фьючерсов, поставка по которым
+    уже началась, больше не торгуются и не учитываются, иначе парсинг начинался бы с давно истекших
+    контрактов. Парсеры без загруженных кривых начинают за DEFAULT_DAYS_BACK дней до `in_end_date`.
+
+    Args:
+        in_curve_states: состояние кривых источника, см. `DBLoaderCurves.get_curve_states`
+        in_end_date: последняя дата для парсинга
+        in_overlap: окно перезагрузки для поздних корректировок
+    Returns:
+        dict - словарь вида {класс парсера: дата начала}
+    """
+    states = in_curve_states
+    has_delivery = states['beg_date'].notna()
+    futures = states[has_delivery]
+    live_futures = futures[pandas.to_datetime(futures['beg_date']) > pandas.to_datetime(futures['last_date']).max()]
+    parser_states = {EexNaturalGasFuturesParser: live_futures if not live_futures.empty else futures}
+    for parser, product_types in PARSER_PRODUCT_TYPES.items():
+        parser_states[parser] = states[~has_delivery & states['product_type'].isin(product_types)]
+
+    start_dates = {}
+    for parser, parser_state in parser_states.items():
+        if parser_state.empty:
+            start_dates[parser] = in_end_date - timedelta(days=DEFAULT_DAYS_BACK)
+        else:
+            start_dates[parser] = min(pandas.Timestamp(parser_state['last_date'].min()).to_pydatetime() - in_overlap,
+                                      in_end_date)
+    return start_dates
+
+
+def load_eex_prices(in_base, in_session, in_end_date: datetime, in_incremental: bool = True,
+                    in_overlap: timedelta = timedelta(days=OVERLAP_DAYS)) -> int:
+    """Парсит цены EEX и загружает их в таблицу `curves`
+
+    В инкрементальном режиме каждый парсер запрашивает данные начиная с самой ранней последней загруженной
+    даты своих кривых за вычетом `in_overlap` (см. `get_start_dates`), а в базу пишутся только значения,
+    более поздние, чем последняя загруженная дата соответствующей кривой (также за вычетом `in_overlap`).
+    Значения в окне перезагрузки обновляются. Без инкрементального режима загружаются последние
+    DEFAULT_DAYS_BACK дней.
+
+    Парсеры используют общий загрузчик, в кэше ответов которого ответы начиная с самой ранней даты начала
+    парсинга не считаются окончательными (см. `ResponseCache.recent_days`): закэшированные ранее ответы
+    для дат окна перезагрузки запрашиваются заново, иначе поздние корректировки не были бы получены.
+
+    Args:
+        in_base: БД
+        in_session: объект сессии в БД
+        in_end_date: последняя дата для парсинга
+        in_incremental: включает инкрементальный режим
+        in_overlap: окно перезагрузки для поздних корректировок
+    Returns:
+        int - количество записанных строк
+    """
+    loader = DBLoaderCurves(in_base, in_session)
+    if in_incremental:
+        curve_states = loader.get_curve_states(EEX_SOURCE_ID)
+        last_dates = dict(zip(curve_states['id_curve'], curve_states['last_date']))
+    else:
+        curve_states = DataFrame(columns=['id_curve', 'last_date', 'product_type', 'beg_date'])
+        last_dates = {}
+    start_dates = get_start_dates(curve_states, in_end_date, in_overlap)
+    recent_days = max((date.today() - min(start_dates.values()).date()).days, 0)
+    fetcher = ConcurrentFetcher(cache=ResponseCache(recent_days=recent_days))
+
+    futures = EexNaturalGasFuturesParser(end_date=in_end_date, start_date=start_dates[EexNaturalGasFuturesParser],
+                                         fetcher=fetcher).parse()
+    indices = EexNaturalGasIndicesParser(end_date=in_end_date, start_date=start_dates[EexNaturalGasIndicesParser],
+                                         fetcher=fetcher).parse()
+    spots = EexNaturalGasSpotParser(end_date=in_end_date, start_date=start_dates[EexNaturalGasSpotParser],
+                                    fetcher=fetcher).parse()
 
     res = pandas.concat([indices, spots, futures])
     # res.to_excel('./output/parse_result.xlsx')
 
+    return loader.bulk_insert_items(res, in_last_dates=last_dates, in_overlap=in_overlap)
+
+
+if __name__ == '__main__':
     connector = DBConnector()
-    base = connector.connect_to_base()
+    # отражаются только таблицы, в которые пишет загрузка цен
+    base = connector.connect_to_base([
+        loader.table_name for loader in DICTIONARY_LOADERS + [
+            DBLoaderProducts, DBLoaderInstrument, DBLoaderPricesType, DBLoaderPriceCurveDict, DBLoaderCurvesDict,
+            DBLoaderCurves
+        ]
+    ])
     session = connector.create_session()
-    for price_index, row in tqdm(res.iterrows(), ncols=100, total=res.shape[0],
-                                 desc='EEX prices loader', disable=False):
-        curve = Price(row.to_dict())
-        DBLoaderCurves(base, session).insert_item(curve)
+    preload_dictionaries(base, session, DICTIONARY_LOADERS + [DBLoaderPricesType])
+    with unit_of_work(session):
+        load_eex_prices(base, session, datetime.today())
 
     session.close()
     connector.engine.dispose()
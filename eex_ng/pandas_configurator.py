@@ -2,9 +2,13 @@ import pandas as pd
 
 
 class PandasConfigurator:
+    """
+    Accumulates parsed responses and builds resulting DataFrame.
+    Appended frames are buffered and concatenated once, on the first read of `df`
+    """
 
     def __init__(self):
-        self.df = pd.DataFrame({
+        self._df = pd.DataFrame({
             'date': [],
             'prices_name': [],
             'price': [],
@@ -18,11 +22,24 @@ class PandasConfigurator:
             'end_date': [],
             'product_type': []
         })
-        self.df['id_source'] = pd.Series([], dtype=int)
+        self._df['id_source'] = pd.Series([], dtype=int)
+        self._frames = []
+
+    @property
+    def df(self) -> pd.DataFrame:
+        if self._frames:
+            self._df = pd.concat([self._df, *self._frames], ignore_index=True)
+            self._frames = []
+        return self._df
+
+    @df.setter
+    def df(self, value: pd.DataFrame):
+        self._frames = []
+        self._df = value
 
     def append(self, date, prices_name, price, hub, unit, currency, price_type,
                products, product_type, id_source: int, beg_date=None, end_date=None):
-        self.df = pd.concat([self.df, pd.DataFrame({
+        self._frames.append(pd.DataFrame({
             'date': date,
             'prices_name': prices_name,
             'price': price,
@@ -35,7 +52,7 @@ class PandasConfigurator:
             'beg_date': beg_date,
             'end_date': end_date,
             'product_type': product_type
-        })], ignore_index=True)
+        }))
 
 
 if __name__ == '__main__':
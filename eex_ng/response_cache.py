@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from datetime import datetime, date, timedelta
+from pathlib import Path
+
+# default location of cached EEX webservice responses
+CACHE_DIR = Path.home() / '.cache' / 'eex_ng'
+
+
+class ResponseCache:
+    """
+    On-disk cache of webservice responses keyed by URL + params.
+
+    Responses for trade dates older than recent_days never change and are kept until evicted,
+    responses for the last recent_days trade dates (which may still get late corrections), the current
+    and future trade dates expire after today_ttl.
+    When the total size exceeds max_size, least recently used responses are removed
+    """
+
+    # request params holding the trade date, in order of priority
+    date_params = ('onDate', 'chartstopdate')
+    date_format = '%Y/%m/%d'
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, today_ttl: float = 3600, max_size: int = 1024 ** 3,
+                 recent_days: int = 3):
+        """
+        :param cache_dir: directory for cached responses
+        :param today_ttl: lifetime in seconds of responses for the current and recent trade dates
+        :param max_size: max total size of cached responses in bytes
+        :param recent_days: number of days before today, responses for which are refetched after today_ttl,
+                            should cover the reload window of late corrections
+        """
+        self.cache_dir = Path(cache_dir)
+        self.today_ttl = today_ttl
+        self.recent_days = recent_days
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url: str, params: dict) -> str:
+        return hashlib.sha256((url + '?' + json.dumps(params, sort_keys=True)).encode()).hexdigest()
+
+    def get_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def is_final(self, params: dict) -> bool:
+        """
+        :return: True if the response is for a trade date older than recent_days and can't change anymore
+        """
+        for param in self.date_params:
+            if param in params:
+                trade_date = datetime.strptime(params[param], self.date_format).date()
+                return trade_date < date.today() - timedelta(days=self.recent_days)
+        return False
+
+    def get_expiration_time(self, params: dict) -> float:
+        """
+        :return: unix time of expiration or 0 if response never expires
+        """
+        return 0 if self.is_final(params) else time.time() + self.today_ttl
+
+    def get(self, url: str, params: dict) -> bytes | None:
+        """
+        :return: cached response content or None if there is no valid cached response
+        """
+        path = self.get_path(self.make_key(url, params))
+        try:
+            with open(path, 'rb') as file:
+                expiration_time = float(file.readline())
+                content = file.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        if expiration_time and expiration_time < time.time():
+            return None
+        # response was saved as final by an instance with a shorter recent_days window
+        if not expiration_time and not self.is_final(params):
+            return None
+        # mtime is used as the last access time for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # response was evicted or cleared after it was read
+            return None
+        return content
+
+    def get_entries(self) -> list[Path]:
+        """
+        :return: cached responses, temporary files of unfinished writes are skipped
+        """
+        return [file for file in self.cache_dir.glob('*/*') if file.suffix != '.tmp']
+
+    def set(self, url: str, params: dict, content: bytes):
+        path = self.get_path(self.make_key(url, params))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write to temporary file first, so that concurrent readers never see a partial response
+        temp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(temp_path, 'wb') as file:
+            file.write(f'{self.get_expiration_time(params)}\n'.encode())
+            file.write(content)
+        with self._lock:
+            # size of the replaced response is subtracted, so that overwriting does not inflate the total
+            try:
+                old_size = path.stat().st_size
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(temp_path, path)
+            if self._size is None:
+                self._size = sum(file.stat().st_size for file in self.get_entries())
+            else:
+                self._size += path.stat().st_size - old_size
+            if self._size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        """
+        removes least recently used responses until the cache takes up 90% of max_size
+        """
+        files = sorted(self.get_entries(), key=lambda file: file.stat().st_mtime)
+        self._size = sum(file.stat().st_size for file in files)
+        for file in files:
+            if self._size <= self.max_size * 0.9:
+                break
+            self._size -= file.stat().st_size
+            file.unlink(missing_ok=True)
+
+    def clear(self):
+        for file in self.get_entries():
+            file.unlink(missing_ok=True)
+        self._size = 0
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+try:
+    # orjson is optional, it decodes large responses several times faster than json
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+def decode_items(content: bytes, fields: list[str], numeric_fields: list[str] = ()) -> dict[str, np.ndarray]:
+    """
+    Decodes EEX webservice response once and extracts only required fields of its items
+    :param content: response body: {"results": {"items": [{...}, ...]}}
+    :param fields: fields to extract as object arrays
+    :param numeric_fields: fields to extract as float arrays, missing and non numeric values become NaN
+    :return: dictionary {'<field>': <array of values of all items>}, arrays are empty if there are no items
+    """
+    items = loads(content)['results']['items']
+    columns = {field: np.array([item.get(field) for item in items], dtype=object) for field in fields}
+    for field in numeric_fields:
+        columns[field] = pd.to_numeric(np.array([item.get(field) for item in items], dtype=object),
+                                       errors='coerce').astype(float)
+    return columns
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# модули eex_ng импортируются как скрипты (`from exxeta_settings import ...`), общие модули - из корня репозитория
+# (`from db_common.engine import ...`)
+for path in Path(__file__).resolve().parents[1:3]:
+    sys.path.insert(0, str(path))
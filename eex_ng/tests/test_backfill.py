@@ -0,0 +1,71 @@
+import pytest
+import pandas as pd
+from datetime import date
+
+# парсеры берут настройки из eex_loader.exxeta_settings
+pytest.importorskip('eex_loader')
+
+from eex_ng.backfill import BackfillPlanner, CoverageGap
+from eex_ng.trading_calendar import TradingCalendar
+
+# Страстная пятница и Пасхальный понедельник 2020
+CALENDAR = TradingCalendar(['2020-04-10', '2020-04-13'])
+
+
+class Parser:
+    """Парсер торговых дней периода, кроме дней из `missing_dates`"""
+    missing_dates = set()
+    calls = []
+
+    def __init__(self, end_date: date, start_date: date, fetcher=None):
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def parse(self) -> pd.DataFrame:
+        self.calls.append((self.start_date, self.end_date))
+        days = pd.date_range(self.start_date, self.end_date)
+        days = days[CALENDAR.is_trading_day(days) & ~days.isin(list(self.missing_dates))]
+        return pd.DataFrame({'date': days, 'value': 1.0})
+
+
+class Planner(BackfillPlanner):
+    chunk_days = {Parser: 5}
+    available_days = {}
+
+
+@pytest.fixture(autouse=True)
+def reset_parser():
+    Parser.missing_dates = set()
+    Parser.calls = []
+
+
+def make_planner(in_checkpoint_dir, in_end_date: date = date(2020, 4, 17)) -> Planner:
+    return Planner(end_date=in_end_date, start_date=date(2020, 4, 6), checkpoint_dir=in_checkpoint_dir,
+                   fetcher=object(), calendar=CALENDAR)
+
+
+def test_parsed_chunks_are_loaded_from_checkpoints(tmp_path):
+    first = make_planner(tmp_path).parse()
+    assert len(Parser.calls) == 3
+    assert sorted(file.name for file in tmp_path.iterdir()) == [
+        'Parser_20200406_20200407.pkl', 'Parser_20200408_20200412.pkl', 'Parser_20200413_20200417.pkl']
+
+    Parser.calls.clear()
+    second = make_planner(tmp_path).parse()
+    assert Parser.calls == []
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_chunk_of_current_day_is_not_checkpointed(tmp_path):
+    make_planner(tmp_path, date.today()).parse()
+    assert not any(file.name.endswith(f'_{date.today():%Y%m%d}.pkl') for file in tmp_path.iterdir())
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_gaps_skip_weekends_and_holidays(tmp_path):
+    Parser.missing_dates = {pd.Timestamp('2020-04-07'), pd.Timestamp('2020-04-09'), pd.Timestamp('2020-04-14')}
+    planner = make_planner(tmp_path)
+    planner.parse()
+    # пропуск 9 и 14 апреля - один разрыв: между ними только выходные дни; 8 апреля цены есть
+    assert planner.find_gaps() == [CoverageGap(Parser, date(2020, 4, 7), date(2020, 4, 7)),
+                                   CoverageGap(Parser, date(2020, 4, 9), date(2020, 4, 14))]
@@ -0,0 +1,11 @@
+import pandas as pd
+import pytest
+from eex_ng.eex_periods import Period
+
+DATES = pd.Series(pd.date_range('2019-01-01', '2026-12-31', freq='D'))
+
+
+@pytest.mark.parametrize('period', Period.__subclasses__(), ids=lambda period: period.__name__)
+def test_get_products_series_matches_get_products(period):
+    expected = [period.get_products(date) for date in DATES]
+    assert period.get_products_series(DATES).tolist() == expected
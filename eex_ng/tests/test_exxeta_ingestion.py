@@ -0,0 +1,136 @@
+import pytest
+from pandas import DataFrame, Timestamp, api
+from exxeta_ingestion import IngestionManager, read_deals_file
+from exxeta_loader import Deal
+
+HEADER = 'Date/Time,Contract,Qty,Price\n'
+ROWS = [
+    '10/01/2024 10:15:00,TTF Base Feb24 ICE ENDEX,10,30.5\n',
+    '10/01/2024 11:00:00,NBP Q1-25,5,80.1\n',
+    '10/01/2024 12:30:00,TTF WE13/14/01/2024 Peak,2,29.9\n',
+    '11/01/2024 09:00:00,THE VTP BOM BOM,3,31.0\n',
+    '11/01/2024 09:05:00,TTF Feb24/Mar24,1,0.4\n',
+    '11/01/2024 09:10:00,TTF/NBP Mar24,1,0.2\n',
+    '11/01/2024 09:20:00,NBP Gas Year 25/26,4,85.0\n',
+]
+
+
+def write_file(in_path, in_rows):
+    in_path.write_text(HEADER + ''.join(in_rows), encoding='utf-8')
+    return in_path
+
+
+def test_read_deals_file_returns_writer_columns(tmp_path):
+    path = write_file(tmp_path / 'deals.csv', ROWS)
+    deals = read_deals_file(path.read_bytes(), path)
+
+    assert len(deals) == len(ROWS)
+    assert set(Deal.fields) <= set(deals.columns)
+    assert api.types.is_datetime64_any_dtype(deals['date'])
+    assert deals['delivery_hours_1'].notna().all()
+    assert list(deals['venue']) == ['Exchange'] + ['OTC'] * 6
+    assert list(deals['delivery_period_type']) == ['Forward', 'Forward', 'Spot', 'Spot', 'Forward', 'Forward',
+                                                   'Forward']
+
+    # колонки, которые читает `DBLoaderDeals.bulk_insert_items`
+    products = Deal.get_products_frame(deals)
+    assert products['beg_date'].notna().all()
+    assert len(Deal.get_products_frame(deals, order=2)) == 2
+
+
+def test_ingest_loads_only_appended_deals(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    path = write_file(data_dir / 'deals.csv', ROWS[:4])
+    manager = IngestionManager(data_dir, tmp_path / 'manifest.json', in_max_workers=1)
+    batches = []
+
+    def writer(in_deals: DataFrame) -> int:
+        batches.append(in_deals)
+        return len(in_deals)
+
+    assert manager.ingest(writer) == 4
+    assert manager.ingest(writer) == 0
+
+    write_file(path, ROWS)
+    assert manager.ingest(writer) == 3
+    assert list(batches[-1]['contract']) == [row.split(',')[1] for row in ROWS[4:]]
+
+    # измененные загруженные сделки не загружаются повторно
+    write_file(path, ROWS[1:] + ROWS[:1])
+    assert manager.ingest(writer) == 0
+    assert list(manager.failed) == ['deals.csv']
+
+
+def test_ingest_does_not_record_failed_transaction(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    write_file(data_dir / 'deals.csv', ROWS)
+    manager = IngestionManager(data_dir, tmp_path / 'manifest.json', in_max_workers=1)
+    rolled_back = []
+
+    class Transaction:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc, traceback):
+            rolled_back.append(exc_type is not None)
+
+    def failing_writer(in_deals: DataFrame) -> int:
+        raise RuntimeError('connection lost')
+
+    assert manager.ingest(failing_writer, Transaction) == 0
+    assert rolled_back == [True]
+    assert 'deals.csv' not in manager.manifest
+
+    assert manager.ingest(lambda deals: len(deals), Transaction) == len(ROWS)
+    assert rolled_back == [True, False]
+
+
+@pytest.mark.parametrize('contract', ['TTF SPOT ph3', 'Unknown Feb24'])
+def test_read_deals_file_skips_unloadable_deals(tmp_path, contract):
+    path = write_file(tmp_path / 'deals.csv', [f'10/01/2024 10:15:00,{contract},1,1.0\n'])
+    assert read_deals_file(path.read_bytes(), path).empty
+
+
+def test_manifest_counts_raw_rows(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    unloadable = '10/01/2024 10:20:00,Unknown Feb24,1,1.0\n'
+    path = write_file(data_dir / 'deals.csv', ROWS[:2] + [unloadable] + ROWS[2:4])
+    manager = IngestionManager(data_dir, tmp_path / 'manifest.json', in_max_workers=1)
+    batches = []
+
+    def writer(in_deals: DataFrame) -> int:
+        batches.append(in_deals)
+        return len(in_deals)
+
+    assert manager.ingest(writer) == 4
+    assert manager.manifest['deals.csv'].rows_loaded == 5
+
+    write_file(path, ROWS[:2] + [unloadable] + ROWS[2:])
+    assert manager.ingest(writer) == 3
+    assert list(batches[-1]['contract']) == [row.split(',')[1] for row in ROWS[4:]]
+
+    # строка без загружаемой сделки тоже входит в проверку дописывания
+    write_file(path, ROWS[:2] + [unloadable.replace('Unknown', 'Other')] + ROWS[2:])
+    assert manager.ingest(writer) == 0
+    assert list(manager.failed) == ['deals.csv']
+
+
+def test_appended_rows_do_not_change_loaded_rows(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    path = data_dir / 'deals.xlsx'
+    rows = [[Timestamp('2024-01-10 10:15'), 'TTF Base Feb24 ICE ENDEX', 10, 30],
+            [Timestamp('2024-01-10 11:00'), 'NBP Q1-25', 5, 80]]
+    columns = ['Date/Time', 'Contract', 'Qty', 'Price']
+    DataFrame(rows, columns=columns).to_excel(path, index=False)
+    manager = IngestionManager(data_dir, tmp_path / 'manifest.json', in_max_workers=1)
+    assert manager.ingest(lambda deals: len(deals)) == 2
+
+    # дробный объем дописанной строки не меняет прочитанные значения целых объемов
+    rows.append([Timestamp('2024-01-11 09:00'), 'THE VTP BOM BOM', 2.5, 31.5])
+    DataFrame(rows, columns=columns).to_excel(path, index=False)
+    assert manager.ingest(lambda deals: len(deals)) == 1
+    assert not manager.failed
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+import pytest
+from pandas import DataFrame, Series
+from exxeta_loader import DBLoader, ID_CACHE
+
+TABLE = SimpleNamespace(__table__=SimpleNamespace(name='delivery_points_dict'))
+
+
+class FakeLoader(DBLoader):
+    """Загрузчик без БД: новые записи получают id по порядку, запрошенные у БД записи сохраняются"""
+
+    def __init__(self):
+        super().__init__(None, None)
+        self.resolved = []
+
+    def _bulk_resolve_dict_items(self, in_distinct: DataFrame, in_table, in_check_column_name: list) -> Series:
+        self.resolved.extend(in_distinct['point_name'])
+        return Series(range(100, 100 + len(in_distinct)), index=in_distinct.index)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    ID_CACHE.clear()
+    yield
+    ID_CACHE.clear()
+
+
+def test_bulk_insert_dict_items_reads_and_fills_id_cache():
+    ID_CACHE.set(ID_CACHE.make_key('delivery_points_dict', ['point_name'], {'point_name': 'TTF'}), 7)
+    loader = FakeLoader()
+    values = DataFrame({'point_name': ['TTF', 'NBP', 'TTF', 'PEG']})
+
+    ids = loader.bulk_insert_dict_items(values, TABLE, ['point_name'])
+    assert list(ids) == [7, 100, 7, 101]
+    assert loader.resolved == ['NBP', 'PEG']
+
+    # повторная загрузка полностью обслуживается кэшем
+    assert list(loader.bulk_insert_dict_items(values, TABLE, ['point_name'])) == [7, 100, 7, 101]
+    assert loader.resolved == ['NBP', 'PEG']
+    assert ID_CACHE.get(ID_CACHE.make_key('delivery_points_dict', ['point_name'], {'point_name': 'PEG'})) == 101
@@ -0,0 +1,83 @@
+import re
+from itertools import product
+import numpy as np
+import pytest
+from pandas import Series
+from exxeta_settings import PARSER_PATTERNS, PARSER_PATTERNS_SPECIFIC, DELIVERY_POINTS_ASSOCIATIONS, \
+    DELIVERY_POINTS_CORRECT
+from exxeta_preprocessing import ContractParser, DeliveryPointClassifier, DistinctValueParser
+
+POINTS = ['TTF', 'NBP', 'CEGH VTP', 'PEG', 'THE', 'RO CEGH VTP PEGAS/TTF Hi Cal 51.6 PEGAS', 'Czech', 'German',
+          'API 2', 'EUA', 'JKM', 'TTF/NBP', 'ZEEBRUGGE', 'Unknown']
+SPECIFICS = ['', 'Base', 'Peak', 'Off-Peak', 'Clean Spark Spread', '(WD 5+6)', 'Block 3+4', 'Anon']
+INSTRUMENTS = ['Feb24', 'Q1-25', 'Month JUN20', 'Quarter1 Q3/20/Q4/20', 'Week W05 2024', 'Day D05/02/2024',
+               'Weekend WE03/04/02/2024', 'BOM BOM', 'BOW', 'Saturday', 'W END', 'Win 2024/2025', 'Sum 2025',
+               'Cal Year 2025', 'Years 2025/2026', 'Gas Year 25/26', 'Prompt Day', 'WD05 2024', 'SPOT ph3',
+               'Feb24/Mar24', '']
+CONTRACTS = Series([' '.join(filter(None, parts)) for parts in product(POINTS, SPECIFICS, INSTRUMENTS)]
+                   + [np.nan, ''])
+
+
+def parse_row(in_patterns: tuple[dict, ...], in_contract: str, in_spread: bool) -> tuple:
+    """Построчный разбор спецификации: первый по порядку шаблон, встречающийся в спецификации"""
+    flags = re.IGNORECASE | re.DOTALL
+    for item in in_patterns:
+        if re.search(item['pattern'], in_contract, flags):
+            instrument = re.compile(item.get('instrument', item['pattern']), flags)
+            first = instrument.search(in_contract)
+            if first is None:
+                return np.nan, np.nan
+            second = instrument.search(in_contract, first.end()) if in_spread else None
+            return get_product(first), np.nan if second is None else get_product(second)
+    return np.nan, np.nan
+
+
+def get_product(in_match: re.Match) -> str:
+    return next((group for group in in_match.groups() if group is not None), in_match.group(0))
+
+
+@pytest.mark.parametrize('patterns, spread', [(PARSER_PATTERNS, True), (PARSER_PATTERNS_SPECIFIC, False)],
+                         ids=['instruments', 'specific'])
+def test_contract_parser_matches_row_by_row_search(patterns, spread):
+    parsed = ContractParser(patterns, in_spread=spread).parse(CONTRACTS)
+    expected = [parse_row(patterns, contract, spread) if isinstance(contract, str) else (np.nan, np.nan)
+                for contract in CONTRACTS]
+    result = list(parsed.itertuples(index=False, name=None))
+    assert len(result) == len(expected)
+    for contract, row, expected_row in zip(CONTRACTS, result, expected):
+        assert Series(row, dtype=object).equals(Series(expected_row, dtype=object)), contract
+
+
+def test_contract_parser_reuses_cached_results():
+    parser = ContractParser(PARSER_PATTERNS)
+    contracts = Series(['TTF Feb24', 'NBP Q1-25', 'TTF Feb24'], index=[10, 11, 12])
+    first = parser.parse(contracts)
+    assert list(first['first']) == ['Feb24', 'Q1-25', 'Feb24']
+    assert list(first.index) == [10, 11, 12]
+    assert len(parser._cache) == 2
+    assert parser.parse(contracts).equals(first)
+
+
+def classify_row(in_contract: str) -> tuple:
+    """Построчное определение товара: первый список пунктов поставки, встречающийся в спецификации"""
+    corrections = {name.lower(): correct_name for name, correct_name in DELIVERY_POINTS_CORRECT.items()}
+    for points, commodity in DELIVERY_POINTS_ASSOCIATIONS:
+        pattern = '|'.join(f'(?:{point})' for point in points)
+        found = [corrections.get(match.group(0).lower(), match.group(0)) for match in re.finditer(pattern, in_contract)]
+        if found:
+            found = list(dict.fromkeys(found)) + [np.nan]
+            return commodity, found[0], found[1]
+    return np.nan, np.nan, np.nan
+
+
+def test_delivery_point_classifier_matches_row_by_row_search():
+    classified = DeliveryPointClassifier(DELIVERY_POINTS_ASSOCIATIONS, DELIVERY_POINTS_CORRECT).parse(CONTRACTS)
+    expected = [classify_row(contract) if isinstance(contract, str) else (np.nan,) * 3 for contract in CONTRACTS]
+    assert list(classified.index) == list(CONTRACTS.index)
+    for contract, row, expected_row in zip(CONTRACTS, classified.itertuples(index=False, name=None), expected):
+        assert Series(row, dtype=object).equals(Series(expected_row, dtype=object)), contract
+
+
+def test_distinct_value_parser_requires_extract():
+    with pytest.raises(TypeError):
+        DistinctValueParser()
@@ -0,0 +1,88 @@
+import random
+import threading
+import time
+import pytest
+import requests
+from eex_ng import fetcher as fetcher_module
+from eex_ng.fetcher import ConcurrentFetcher
+
+URL = 'https://webservice-eex.gvsi.com/query/json/getDaily/close/'
+
+
+class Response:
+
+    def __init__(self, content: bytes, status_code: int = 200):
+        self.content = content
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} response', response=self)
+
+
+def test_fetch_all_keeps_order_and_bounds_concurrent_calls(monkeypatch):
+    lock = threading.Lock()
+    active = []
+    max_active = []
+
+    def get(url, params=None, headers=None, timeout=None):
+        with lock:
+            active.append(params)
+            max_active.append(len(active))
+        time.sleep(random.uniform(0, 0.01))
+        with lock:
+            active.remove(params)
+        return Response(str(params['n']).encode())
+
+    monkeypatch.setattr(fetcher_module.http_client, 'get', get)
+    fetcher = ConcurrentFetcher(max_workers=3, requests_per_second=None)
+    results = {}
+
+    def fetch(in_name: str):
+        results[in_name] = fetcher.fetch_all(URL, [{'n': n, 'call': in_name} for n in range(20)], {})
+
+    # два вызова fetch_all из разных потоков делят ограничение max_workers
+    threads = [threading.Thread(target=fetch, args=(name,)) for name in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {name: [str(n).encode() for n in range(20)] for name in ('a', 'b')}
+    assert max(max_active) <= 3
+
+
+def test_retry_statuses_and_connection_errors_are_retried_with_backoff(monkeypatch):
+    responses = [Response(b'', 503), requests.ConnectionError(), Response(b'', 429), Response(b'ok')]
+
+    def get(url, params=None, headers=None, timeout=None):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    delays = []
+    monkeypatch.setattr(fetcher_module.http_client, 'get', get)
+    monkeypatch.setattr(fetcher_module.time, 'sleep', delays.append)
+    assert ConcurrentFetcher(retries=3, backoff=0.5, requests_per_second=None).get(URL, {}, {}) == b'ok'
+    assert delays == [0.5, 1.0, 2.0]
+
+
+def test_errors_are_raised_after_retries_or_immediately(monkeypatch):
+    calls = []
+
+    def get(url, params=None, headers=None, timeout=None):
+        calls.append(params)
+        return Response(b'', params['status'])
+
+    monkeypatch.setattr(fetcher_module.http_client, 'get', get)
+    monkeypatch.setattr(fetcher_module.time, 'sleep', lambda _: None)
+    fetcher = ConcurrentFetcher(retries=2, requests_per_second=None)
+    with pytest.raises(requests.HTTPError):
+        fetcher.get(URL, {'status': 503}, {})
+    assert len(calls) == 3
+
+    # статусы, не входящие в retry_statuses, не повторяются
+    calls.clear()
+    with pytest.raises(requests.HTTPError):
+        fetcher.get(URL, {'status': 404}, {})
+    assert len(calls) == 1
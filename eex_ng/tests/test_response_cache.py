@@ -0,0 +1,124 @@
+import os
+import time
+from datetime import date, timedelta
+from eex_ng import fetcher as fetcher_module
+from eex_ng.fetcher import ConcurrentFetcher, get_default_fetcher
+from eex_ng.response_cache import ResponseCache
+
+URL = 'https://webservice-eex.gvsi.com/query/json/getDaily/close/'
+
+
+class Response:
+    status_code = 200
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+def get_params(in_days_ago: int) -> dict:
+    return {'onDate': (date.today() - timedelta(days=in_days_ago)).strftime(ResponseCache.date_format)}
+
+
+def patch_requests(monkeypatch) -> list:
+    """Подменяет запросы к вебсервису, возвращает список выполненных запросов"""
+    requests_made = []
+
+    def get(url, params=None, headers=None, timeout=None):
+        requests_made.append(params)
+        return Response(f'response {len(requests_made)}'.encode())
+
+    monkeypatch.setattr(fetcher_module.http_client, 'get', get)
+    return requests_made
+
+
+def test_overlap_date_is_refetched_after_ttl(tmp_path, monkeypatch):
+    requests_made = patch_requests(monkeypatch)
+    fetcher = ConcurrentFetcher(cache=ResponseCache(tmp_path, today_ttl=60, recent_days=3), max_workers=1)
+    overlap, final = get_params(2), get_params(10)
+
+    assert fetcher.get(URL, overlap, {}) == b'response 1'
+    assert fetcher.get(URL, final, {}) == b'response 2'
+    assert fetcher.get(URL, overlap, {}) == b'response 1'
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    # корректировка в окне перезагрузки получена, окончательный ответ берется из кэша
+    assert fetcher.get(URL, overlap, {}) == b'response 3'
+    assert fetcher.get(URL, final, {}) == b'response 2'
+    assert requests_made == [overlap, final, overlap]
+
+
+def test_response_saved_as_final_is_refetched_inside_wider_window(tmp_path, monkeypatch):
+    requests_made = patch_requests(monkeypatch)
+    params = get_params(5)
+    ConcurrentFetcher(cache=ResponseCache(tmp_path, recent_days=3)).get(URL, params, {})
+    assert ConcurrentFetcher(cache=ResponseCache(tmp_path, recent_days=3)).get(URL, params, {}) == b'response 1'
+
+    # загрузка с окном перезагрузки 7 дней не берет из кэша ответ, сохраненный как окончательный
+    assert ConcurrentFetcher(cache=ResponseCache(tmp_path, recent_days=7)).get(URL, params, {}) == b'response 2'
+    assert len(requests_made) == 2
+
+
+def get_total_size(in_cache: ResponseCache) -> int:
+    return sum(file.stat().st_size for file in in_cache.get_entries())
+
+
+def test_recent_response_expires_after_ttl(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path, today_ttl=60, recent_days=3)
+    cache.set(URL, get_params(0), b'today')
+    cache.set(URL, get_params(10), b'final')
+    assert cache.get(URL, get_params(0)) == b'today'
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    assert cache.get(URL, get_params(0)) is None
+    assert cache.get(URL, get_params(10)) == b'final'
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    cache = ResponseCache(tmp_path, max_size=1000)
+    for n, name in enumerate('abc', 1):
+        cache.set(URL, {'name': name}, name.encode() * 300)
+        os.utime(cache.get_path(cache.make_key(URL, {'name': name})), (n, n))
+    # чтение обновляет время последнего обращения, поэтому 'a' становится самым свежим ответом
+    assert cache.get(URL, {'name': 'a'}) == b'a' * 300
+
+    cache.set(URL, {'name': 'd'}, b'd' * 300)
+    assert [cache.get(URL, {'name': name}) is not None for name in 'abcd'] == [True, False, False, True]
+    assert cache._size == get_total_size(cache) <= cache.max_size * 0.9
+
+
+def test_size_accounting_skips_temporary_files_and_overwrites(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.set(URL, {'name': 'a'}, b'a' * 100)
+    (tmp_path / 'ab').mkdir()
+    (tmp_path / 'ab' / 'unfinished.123.456.tmp').write_bytes(b'x' * 1000)
+
+    # размер кэша считается заново по файлам в каталоге
+    cache = ResponseCache(tmp_path)
+    cache.set(URL, {'name': 'b'}, b'b' * 100)
+    for _ in range(3):
+        cache.set(URL, {'name': 'a'}, b'a' * 200)
+    assert len(cache.get_entries()) == 2
+    assert cache._size == get_total_size(cache)
+
+
+def test_response_removed_while_read_is_a_miss(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path)
+    cache.set(URL, {}, b'content')
+
+    def utime(path, *args, **kwargs):
+        # ответ удален другим процессом между чтением и обновлением времени обращения
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, 'utime', utime)
+    assert cache.get(URL, {}) is None
+
+
+def test_default_fetcher_is_shared():
+    assert get_default_fetcher() is get_default_fetcher()
+    assert isinstance(get_default_fetcher().cache, ResponseCache)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from exxeta_settings import HOLIDAY
+from trading_calendar import TradingCalendar
+
+# Страстная пятница и Пасхальный понедельник 2020
+CALENDAR = TradingCalendar(['2020-04-10', '2020-04-13'])
+
+
+def days(*in_dates) -> np.ndarray:
+    return np.array(in_dates, dtype='datetime64[D]')
+
+
+def test_delivery_window_skips_holidays():
+    trade_dates = ['2020-04-09', '2020-04-08', '2024-01-10', '2024-01-14', '2024-02-10', '2024-02-10']
+    start, end = CALENDAR.get_delivery_window(trade_dates, ['Day', 'Weekend', 'BOW', 'BOW', 'BOM', 'Month'])
+    np.testing.assert_array_equal(start, days('2020-04-14', '2020-04-10', '2024-01-11', '2024-01-15', '2024-02-11',
+                                              'NaT'))
+    np.testing.assert_array_equal(end, days('2020-04-14', '2020-04-13', '2024-01-14', '2024-01-21', '2024-02-29',
+                                            'NaT'))
+
+
+def test_delivery_hours_follow_daylight_saving_time():
+    hours = CALENDAR.get_delivery_hours(['2024-03-31', '2024-10-27', '2024-01-01'],
+                                        ['2024-03-31', '2024-10-27', '2024-01-31'])
+    np.testing.assert_array_equal(hours, [23, 25, 744])
+
+
+def test_peak_hours_exclude_holidays_on_request():
+    start, end = ['2020-04-06', None], ['2020-04-17', '2020-04-17']
+    np.testing.assert_array_equal(CALENDAR.get_delivery_hours(start, end, 'peak'), [120, np.nan])
+    np.testing.assert_array_equal(CALENDAR.get_delivery_hours(start, end, 'peak', in_holiday_peak=False), [96, np.nan])
+    np.testing.assert_array_equal(CALENDAR.get_delivery_hours(start, end, 'offpeak', in_holiday_peak=False),
+                                  [192, np.nan])
+    with pytest.raises(ValueError):
+        CALENDAR.get_delivery_hours(start, end, 'night')
+
+
+def test_calendar_from_file(tmp_path):
+    path = tmp_path / 'holidays.csv'
+    path.write_text('# банковские выходные\n2020-04-10,Good Friday\n2020-04-13,Easter Monday\n')
+    calendar = TradingCalendar.from_file(path)
+    np.testing.assert_array_equal(calendar.is_trading_day(['2020-04-09', '2020-04-10', '2020-04-13']),
+                                  [True, False, False])
+    fallback = TradingCalendar.from_file(tmp_path / 'missing.csv')
+    assert not fallback.is_trading_day(HOLIDAY).any()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from exxeta_settings import HOLIDAY, HOLIDAY_FILE
+
+"""
+Календарь торговых дней для расчета периодов и часов поставки экзитовских сделок.
+Все расчеты выполняются над колонками целиком через numpy.busday_offset / numpy.busday_count
+"""
+
+# часовой пояс, в котором считаются часы поставки (переходы на летнее/зимнее время меняют длину суток)
+DELIVERY_TIMEZONE = 'Europe/Berlin'
+
+# часы пиковой нагрузки в каждый будний день (08:00 - 20:00)
+PEAK_HOURS_PER_DAY = 12
+
+
+class TradingCalendar:
+    """Календарь торговых дней на основе `numpy.busdaycalendar`
+
+    Торговые дни - дни недели из `in_weekmask`, кроме выходных дней `in_holidays`.
+
+    Attributes:
+        in_holidays: выходные дни, в которые отсутствуют торги
+        in_weekmask: торговые дни недели в формате numpy.busdaycalendar
+        in_timezone: часовой пояс для расчета часов поставки
+    """
+
+    def __init__(self, in_holidays: list | None = None, in_weekmask: str = 'Mon Tue Wed Thu Fri',
+                 in_timezone: str = DELIVERY_TIMEZONE):
+        holidays = HOLIDAY if in_holidays is None else in_holidays
+        self.calendar = np.busdaycalendar(weekmask=in_weekmask, holidays=_to_days(holidays))
+        self.weekmask = in_weekmask
+        self.timezone = in_timezone
+
+    @classmethod
+    def from_file(cls, in_path: Path = HOLIDAY_FILE, **kwargs) -> TradingCalendar:
+        """Создает календарь с выходными днями из файла
+
+        Args:
+            in_path: CSV без заголовка с колонками: дата YYYY-MM-DD, наименование; строки с '#' игнорируются
+        Returns:
+            TradingCalendar - календарь, а если файла нет - календарь с выходными днями из HOLIDAY
+        """
+        if not Path(in_path).exists():
+            return cls(**kwargs)
+        holidays = pd.read_csv(in_path, header=None, comment='#', usecols=[0], skip_blank_lines=True)[0]
+        return cls(pd.to_datetime(holidays.str.strip()).tolist(), **kwargs)
+
+    def is_trading_day(self, in_dates) -> np.ndarray:
+        return np.is_busday(_to_days(in_dates), busdaycal=self.calendar)
+
+    def offset_trading_days(self, in_dates, in_offset=1) -> np.ndarray:
+        """Сдвигает даты на `in_offset` торговых дней
+
+        Неторговые даты сначала сдвигаются назад к ближайшему торговому дню, поэтому при `in_offset` = 1
+        результат - первый торговый день строго после даты.
+        """
+        return np.busday_offset(_to_days(in_dates), in_offset, roll='backward', busdaycal=self.calendar)
+
+    def count_trading_days(self, in_start_dates, in_end_dates) -> np.ndarray:
+        """Считает торговые дни между датами, включая обе границы"""
+        return np.busday_count(_to_days(in_start_dates), _to_days(in_end_dates) + 1, busdaycal=self.calendar)
+
+    def get_delivery_window(self, in_trade_dates, in_period_types) -> tuple[np.ndarray, np.ndarray]:
+        """Рассчитывает начало и конец поставки для продуктов, период которых зависит от даты сделки
+
+        - 'Day' - следующий торговый день;
+        - 'Weekend' - от дня после последнего торгового дня перед ближайшей субботой до дня перед первым
+          торговым днем после воскресенья (выходные, примыкающие к субботе и воскресенью, входят в поставку);
+        - 'BOW' - от следующего дня до ближайшего воскресенья;
+        - 'BOM' - от следующего дня до конца месяца.
+        Для остальных типов периода (месяцы, кварталы и тд) возвращается NaT, их период задается продуктом.
+
+        Args:
+            in_trade_dates: даты сделок
+            in_period_types: типы периодов поставки
+        Returns:
+            tuple - массивы datetime64[D] с датами начала и конца поставки (включительно)
+        """
+        trade_dates = _to_days(in_trade_dates)
+        period_types = np.asarray(in_period_types, dtype=object)
+        start = np.full(trade_dates.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+        end = start.copy()
+        next_day = trade_dates + 1
+        # numpy считает неделю с понедельника, 1970-01-01 - четверг
+        days_to_sunday = 6 - (trade_dates.astype(np.int64) + 3) % 7
+
+        is_day = period_types == 'Day'
+        start[is_day] = self.offset_trading_days(trade_dates[is_day])
+        end[is_day] = start[is_day]
+
+        is_weekend = period_types == 'Weekend'
+        sunday = trade_dates[is_weekend] + np.where(days_to_sunday[is_weekend] == 0, 7, days_to_sunday[is_weekend])
+        start[is_weekend] = self.offset_trading_days(sunday - 1, 0) + 1
+        end[is_weekend] = self.offset_trading_days(sunday) - 1
+
+        is_bow = period_types == 'BOW'
+        start[is_bow] = next_day[is_bow]
+        end[is_bow] = trade_dates[is_bow] + np.where(days_to_sunday[is_bow] == 0, 7, days_to_sunday[is_bow])
+
+        is_bom = period_types == 'BOM'
+        start[is_bom] = next_day[is_bom]
+        end[is_bom] = (trade_dates[is_bom].astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+        return start, end
+
+    def get_delivery_hours(self, in_start_dates, in_end_dates, in_profile: str = 'base',
+                           in_holiday_peak: bool = True) -> np.ndarray:
+        """Считает часы поставки с учетом переходов на летнее/зимнее время
+
+        Поставка идет во все календарные дни, поэтому 'base' считает все часы периода, включая выходные дни
+        без торгов. Для 'peak' по умолчанию пиковыми считаются все будние дни, включая выходные дни
+        без торгов (как в пиковых контрактах EEX); при `in_holiday_peak` = False они исключаются, а их часы
+        попадают в 'offpeak'.
+
+        Args:
+            in_start_dates: даты начала поставки
+            in_end_dates: даты конца поставки (включительно)
+            in_profile: 'base' - все часы, 'peak' - 08:00 - 20:00 по будним дням, 'offpeak' - остальные часы
+            in_holiday_peak: считать ли выходные дни без торгов, выпавшие на будни, пиковыми
+        Returns:
+            ndarray - часы поставки, NaN для пропущенных дат
+        """
+        start = pd.DatetimeIndex(_to_days(in_start_dates))
+        end = pd.DatetimeIndex(_to_days(in_end_dates) + 1)
+        base = ((end.tz_localize(self.timezone, nonexistent='shift_forward', ambiguous=False)
+                 - start.tz_localize(self.timezone, nonexistent='shift_forward', ambiguous=False))
+                / pd.Timedelta(hours=1)).to_numpy(dtype=float)
+        if in_profile == 'base':
+            return base
+        valid = ~(np.isnat(_to_days(in_start_dates)) | np.isnat(_to_days(in_end_dates)))
+        peak = np.full(base.shape, np.nan)
+        calendar = {'weekmask': self.weekmask} if in_holiday_peak else {'busdaycal': self.calendar}
+        peak[valid] = np.busday_count(_to_days(in_start_dates)[valid], _to_days(in_end_dates)[valid] + 1,
+                                      **calendar) * PEAK_HOURS_PER_DAY
+        if in_profile == 'peak':
+            return peak
+        if in_profile == 'offpeak':
+            return base - peak
+        raise ValueError(f"Unknown delivery profile '{in_profile}'")
+
+
+def _to_days(in_dates) -> np.ndarray:
+    """Приводит даты (список, Series, DatetimeIndex, массив) к массиву datetime64[D]"""
+    if isinstance(in_dates, np.ndarray) and in_dates.dtype.kind == 'M':
+        return in_dates.astype('datetime64[D]')
+    return np.asarray(pd.to_datetime(in_dates), dtype='datetime64[D]')
@@ -1,3 +1,4 @@
+import os
 
 # хотелось вынести все константы в одно место, в main.py не получилось
 # из-за возниконовения цикличных импортов (из main.py в excel_utils.py импортится
@@ -7,3 +8,7 @@ INPUT_PATH = './src'  # папка с входными xlsx файлами
 TEMP_PATH = './tmp'  # папка для хранения временных файлов внутри рабочей директории
 OUTPUT_PATH = './out'  #
 QUERIES_PATH = './queries'  # папка с запросами
+SCHEMA_CACHE_PATH = './cache/schema'  # папка для кэша отраженной схемы БД
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 4))  # количество книг, обрабатываемых одновременно
+# формировать XML листа напрямую, не загружая книгу в openpyxl целиком
+STREAM_SHEET_MODE = os.environ.get('STREAM_SHEET_MODE', 'false').lower() == 'true'
@@ -3,10 +3,13 @@ from __future__ import annotations
 import pandas as pd
 from loguru import logger
 from pandas import DataFrame
-from sqlalchemy import create_engine, text
+from pathlib import Path
+from sqlalchemy import text, MetaData
 from sqlalchemy.ext.automap import automap_base
 from sqlalchemy.orm import Session
 from db_config import DBConfigInstance, ANALYTICS_BASE_DB_CONFIG
+from db_common.engine import get_engine, reflect_metadata
+from config import SCHEMA_CACHE_PATH
 
 
 class DBConnector:
@@ -21,14 +24,12 @@ class DBConnector:
         self.base = None
 
     def create_engine(self):
-        """Создает подключение к БД
+        """Создает подключение к БД (общее для процесса, см. `get_engine`)
 
         Returns:
             Engine: объект подключения engine
         """
-        logger.debug(f'creating engine with {self._config} config')
-        self.engine = create_engine(
-            self._config, echo=False)
+        self.engine = get_engine(self._config)
         return self.engine
 
     def create_session(self):
@@ -40,17 +41,35 @@ class DBConnector:
         self.session = Session(bind=self.engine)
         return self.session
 
-    def connect_to_base(self):
+    def connect_to_base(self, in_tables: list | None = None, in_cache_dir: Path | None = Path(SCHEMA_CACHE_PATH)):
         """Отображает схему БД
 
+        Отражаются только таблицы `in_tables` (и таблицы, на которые они ссылаются), по умолчанию - все.
+        Отраженная схема сохраняется в `in_cache_dir` и используется повторно, пока не изменится
+        отпечаток схемы (см. `db_common.engine.SCHEMA_HASH_QUERY`).
+
+        Args:
+            in_tables: наименования таблиц для отражения
+            in_cache_dir: папка для кэша отраженной схемы, None отключает кэш
         Returns:
             AutomapBase: БД
         """
-        self.base = automap_base()
         self.create_engine()
-        self.base.prepare(self.engine, reflect=True)
+        self.base = automap_base(metadata=self.reflect_metadata(in_tables, in_cache_dir))
+        self.base.prepare()
         return self.base
 
+    def reflect_metadata(self, in_tables: list | None, in_cache_dir: Path | None) -> MetaData:
+        """Отражает таблицы БД или загружает их из кэша (см. `db_common.engine.reflect_metadata`)
+
+        Args:
+            in_tables: наименования таблиц для отражения, None - все таблицы
+            in_cache_dir: папка для кэша отраженной схемы, None отключает кэш
+        Returns:
+            MetaData: отраженные таблицы
+        """
+        return reflect_metadata(self.engine, in_tables, in_cache_dir)
+
 
 class DBLoader:
     """Базовый класс для загрузки данных в БД
@@ -67,16 +86,17 @@ class DBLoader:
 
 def execute_query_to_dataframe(query_text: str) -> DataFrame:
     """
-    Connects to DB, executes query_text into pandas DataFrame
+    Connects to DB, executes query_text into pandas DataFrame.
+    Schema is not reflected, as the query is executed as plain SQL
     """
     connector = DBConnector()
-    base = connector.connect_to_base()
+    connector.create_engine()
     session = connector.create_session()
 
     df = pd.read_sql_query(query_text, session.connection().connection)
 
+    # соединение возвращается в общий пул и используется следующими запросами
     session.close()
-    connector.engine.dispose()
     return df
 
 
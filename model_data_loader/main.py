@@ -2,17 +2,18 @@ import os
 import re
 import shutil
 import sys
-from io import StringIO
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 from openpyxl.reader.excel import load_workbook
 from pandas import DataFrame
-import xml.etree.ElementTree as ElementTree
 from db_loader import execute_query_to_dataframe
 from formula_parser import FormulaParser
-from config import TEMP_PATH, INPUT_PATH, OUTPUT_PATH
+from config import TEMP_PATH, INPUT_PATH, OUTPUT_PATH, MAX_WORKERS, STREAM_SHEET_MODE
 from utils.time_utils import get_date_range
 from query_generator import generate_query
-from utils.excel_utils import load_xlsx_row, get_column_offset, get_first_num_row_index, get_connections, update_sheet
+from utils.excel_utils import read_sheet_metadata, get_connections, update_sheet, get_sheet_xml_name, \
+    generate_sheet_xml, has_shared_formulas, get_date_style
 from utils.zip_utils import extract_zip, insert_zip
 from datetime import datetime, timedelta
 from loguru import logger
@@ -37,41 +38,61 @@ def process_model(input_file_path, temp_file_path, output_file_path,
     if end_date - begin_date < timedelta(0):
         raise Exception("end_date can't be before begin_date")
 
-    # TODO убрать из копии лишние листы, чтобы сократить время открытия/закрытия книги
-    #  пока не удалось, если убирать лишние листы, забивая содержимое файлов нулями,
-    #  то openpyxl жалуется, что xlsx битый
-    # создаем копию книги
-    shutil.copy(input_file_path, temp_file_path)
+    # метаданные листа читаются за один проход без загрузки книги, поэтому запрос можно
+    # сгенерировать и выполнить, пока книга загружается в отдельном потоке
+    logger.info('reading sheet metadata')
+    metadata = read_sheet_metadata(input_file_path, sheet_name)
+    column_offset, row_offset = metadata.column_offset, metadata.row_offset
+    formulas, column_names = metadata.formulas, metadata.column_names
+    logger.info(f'loaded formulas from {metadata.max_row}')
 
-    logger.info('loading workbook')
-    workbook = load_workbook(temp_file_path)
-
-    column_offset = get_column_offset(workbook, sheet_name, 10)
-    row_offset = get_first_num_row_index(workbook, sheet_name, 10)
-
-    logger.info('workbook loaded, parsing formulas')
-    # читаем формулы из последней строки
-    formulas = load_xlsx_row(workbook, sheet_name, workbook[sheet_name].max_row)
-    logger.info(f'loaded formulas from {workbook[sheet_name].max_row}')
-
-    # адрес строки с именами колонок row_offset-1 и +1 тк нумерация строк с 1
-    column_names = load_xlsx_row(workbook, sheet_name, row_offset)
-
-    # разархивируем копию in-memory
-    temporary_extracted = extract_zip(temp_file_path)
+    # разархивируем входной файл in-memory, изменения вносятся в него
+    main_extracted = extract_zip(input_file_path)
+    target_xml_name = get_sheet_xml_name(main_extracted, sheet_name)
+    # общие формулы openpyxl разворачивает при загрузке, а потоковая запись не умеет, см. has_shared_formulas
+    stream_sheet = STREAM_SHEET_MODE and not has_shared_formulas(main_extracted[target_xml_name])
+    if STREAM_SHEET_MODE and not stream_sheet:
+        logger.info(f'sheet {sheet_name} has shared formulas, updating it with openpyxl')
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        workbook_future = None
+        if not stream_sheet:
+            # TODO убрать из копии лишние листы, чтобы сократить время открытия/закрытия книги
+            #  пока не удалось, если убирать лишние листы, забивая содержимое файлов нулями,
+            #  то openpyxl жалуется, что xlsx битый
+            # создаем копию книги
+            shutil.copy(input_file_path, temp_file_path)
+            logger.info('loading workbook')
+            workbook_future = pool.submit(load_workbook, temp_file_path)
+
+        # парсим формулы екселя в python объекты
+        formula_parser = FormulaParser(formulas[:], get_connections(main_extracted), model_name)
+
+        logger.info('formulas parsed, generating query')
+        # генерируем запрос, результат запроса помещаем в pandas DataFrame
+        query = generate_query(
+            list(formula_parser.data_sources.values()), formula_parser.sum_if_formulas, column_names, begin_date,
+            end_date
+        )
+        logger.debug('generated query:\n' + query)
 
-    # парсим формулы екселя в python объекты
-    formula_parser = FormulaParser(formulas[:], get_connections(temporary_extracted), model_name)
+        logger.info('query generated, executing query')
+        df_generated: DataFrame = execute_query_to_dataframe(query)
 
-    logger.info('formulas parsed, generating query')
-    # генерируем запрос, результат запроса помещаем в pandas DataFrame
-    query = generate_query(
-        list(formula_parser.data_sources.values()), formula_parser.sum_if_formulas, column_names, begin_date, end_date
-    )
-    logger.debug('generated query:\n' + query)
+        workbook = workbook_future.result() if workbook_future is not None else None
 
-    logger.info('query generated, executing query')
-    df_generated: DataFrame = execute_query_to_dataframe(query)
+    if stream_sheet:
+        # XML листа формируется напрямую из исходного, из остальных файлов книги может измениться только
+        # xl/styles.xml, если в нем еще нет стиля для дат
+        logger.info(f'query executed, generating sheet {sheet_name}')
+        main_extracted['xl/styles.xml'], date_style = get_date_style(main_extracted['xl/styles.xml'])
+        main_extracted[target_xml_name] = generate_sheet_xml(
+            main_extracted[target_xml_name], df_generated, column_names, formulas, row_offset, column_offset,
+            date_style
+        )
+        insert_zip(output_file_path, main_extracted)
+        logger.info(f'finished processing {model_name}')
+        return
 
     # В копию книги в лист 'sheet_name' вносим изменения
     logger.info(f'query executed, updating sheet {sheet_name}')
@@ -84,31 +105,7 @@ def process_model(input_file_path, temp_file_path, output_file_path,
     temporary_extracted = extract_zip(temp_file_path)
 
     # Копию листа из временной книги вставляем в исходную
-    workbook_xml_str = temporary_extracted['xl/workbook.xml'].decode("utf-8")
-
-    # взято с https://stackoverflow.com/a/42338368
-    namespace = dict([node for _, node in ElementTree.iterparse(StringIO(workbook_xml_str), events=['start-ns'])])
-
-    tree = ElementTree.fromstring(workbook_xml_str)
-    sheets = tree.findall('.//{' + namespace[''] + '}sheet')
-
-    target_xml = None
-    target_xml_name = ''
-    for sheet in sheets:
-        if sheet.attrib['name'] == sheet_name:
-            sheet_r_id = sheet.attrib['{' + namespace['r'] + '}id']
-            matcher = re.search(r'\d+$', sheet_r_id)
-            if not matcher:
-                raise ValueError('cant find index')
-            sheet_index = matcher.group()
-            target_xml_name = 'xl/worksheets/sheet' + sheet_index + '.xml'
-            target_xml = temporary_extracted[target_xml_name]
-    if target_xml is None:
-        raise ValueError('Target list "Daily" was not found')
-
-    # разархивируем входной файл, чтобы внести изменения в него
-    main_extracted = extract_zip(input_file_path)
-    main_extracted[target_xml_name] = target_xml
+    main_extracted[target_xml_name] = temporary_extracted[target_xml_name]
 
     insert_zip(output_file_path, main_extracted)
 
@@ -116,38 +113,89 @@ def process_model(input_file_path, temp_file_path, output_file_path,
     logger.info(f'finished processing {model_name}')
 
 
-def main():
+def set_logger(in_logger):
+    """Передает логгер главного процесса в процесс пула, чтобы записи всех книг шли в один обработчик"""
+    global logger
+    logger = in_logger
+
+
+def process_file(file_name: str):
+    """
+    Обрабатывает один xlsx файл из INPUT_PATH, временные файлы хранятся в отдельной папке внутри TEMP_PATH,
+    поэтому несколько файлов могут обрабатываться одновременно
+    Parameters:
+        file_name: имя xlsx файла
+    """
+    matcher = re.match(r'(.*)(?=\.xlsx)', file_name)
+    logger.info(f'processing {file_name} file')
+    if matcher:
+        model_name = matcher.group(0)
+    else:
+        raise RuntimeError(f'empty file name: {file_name}')
+    # TODO what's range to use?
+    begin_date, end_date = get_date_range()
+    logger.debug('date range: from ' + begin_date.strftime('%d.%m.%Y') + ' to ' + end_date.strftime('%d.%m.%Y'))
+    with tempfile.TemporaryDirectory(prefix=model_name + '_', dir=TEMP_PATH) as temp_path:
+        process_model(
+            input_file_path=INPUT_PATH + '/' + file_name,
+            temp_file_path=temp_path + '/' + file_name,
+            output_file_path=OUTPUT_PATH + '/' + file_name,
+            model_name=model_name,
+            sheet_name='Daily',
+            begin_date=begin_date, end_date=end_date
+        )
+
+
+def main(max_workers: int = MAX_WORKERS) -> list[str]:
+    """
+    Обрабатывает все xlsx файлы из INPUT_PATH, по max_workers файлов одновременно.
+    Ошибка в одном файле не прерывает обработку остальных
+    Parameters:
+        max_workers: количество процессов, 1 - последовательная обработка в текущем процессе
+    Returns:
+        имена файлов, которые не удалось обработать
+    """
 
     logger.info('starting')
 
     if not os.path.exists('./' + TEMP_PATH):
         os.makedirs('./' + TEMP_PATH)
 
+    file_names = []
     for file_name in os.listdir(INPUT_PATH):
         if not re.match(r'.*\.xlsx$', file_name):
             logger.debug(f'skipping {file_name}')
             continue
-        matcher = re.match(r'(.*)(?=\.xlsx)', file_name)
-        logger.info(f'processing {file_name} file')
-        if matcher:
-            model_name = matcher.group(0)
-        else:
-            raise RuntimeError(f'empty file name: {file_name}')
-        # TODO what's range to use?
-        begin_date, end_date = get_date_range()
-        logger.debug('date range: from ' + begin_date.strftime('%d.%m.%Y') + ' to ' + end_date.strftime('%d.%m.%Y'))
-        process_model(
-            input_file_path=INPUT_PATH + '/' + file_name,
-            temp_file_path=TEMP_PATH + '/' + file_name,
-            output_file_path=OUTPUT_PATH + '/' + file_name,
-            model_name=model_name,
-            sheet_name='Daily',
-            begin_date=begin_date, end_date=end_date
-        )
-    logger.info('finished processing files')
+        file_names.append(file_name)
+
+    failed = []
+    if max_workers <= 1 or len(file_names) <= 1:
+        for file_name in file_names:
+            try:
+                process_file(file_name)
+            except Exception:
+                logger.exception(f'failed to process {file_name}')
+                failed.append(file_name)
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(file_names)),
+                                 initializer=set_logger, initargs=(logger,)) as pool:
+            futures = {pool.submit(process_file, file_name): file_name for file_name in file_names}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.opt(exception=e).error(f'failed to process {futures[future]}')
+                    failed.append(futures[future])
+
+    logger.info(f'finished processing files: {len(file_names) - len(failed)} processed, {len(failed)} failed')
+    if failed:
+        logger.error('failed files: ' + ', '.join(sorted(failed)))
+    return failed
 
 
 if __name__ == '__main__':
     logger.remove()
-    logger.add(sys.stderr, level="INFO")
-    main()
+    # enqueue=True, чтобы записи из процессов пула не перемешивались
+    logger.add(sys.stderr, level="INFO", enqueue=True)
+    if main():
+        sys.exit(1)
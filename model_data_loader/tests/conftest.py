@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# модули model_data_loader импортируются как скрипты (`from utils.excel_utils import ...`)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,74 @@
+from datetime import datetime
+import pytest
+from openpyxl import Workbook, load_workbook
+from pandas import DataFrame
+from utils.excel_utils import generate_sheet_xml, get_date_style, get_sheet_xml_name, has_shared_formulas, \
+    update_sheet
+from utils.zip_utils import extract_zip, insert_zip
+
+SHEET_NAME = 'Daily'
+COLUMN_NAMES = ['Date', 'Value']
+FORMULAS = ['-1', '=SUM(B2:B4)']
+DATA = DataFrame({'Date': [datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 3)],
+                  'Value': [1.5, 2.0, 3.25]})
+
+
+def make_workbook(in_path, in_with_data_rows: bool = True):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = SHEET_NAME
+    sheet.append(COLUMN_NAMES)
+    if in_with_data_rows:
+        sheet.append([datetime(2023, 12, 30), 1.0])
+        sheet['A2'].number_format = 'dd.mm.yyyy'
+        sheet.append([-1, '=SUM(B2:B2)'])
+    workbook.create_sheet('Other')['A1'] = 'kept'
+    workbook.save(in_path)
+    return in_path
+
+
+def stream_workbook(in_input_path, in_output_path):
+    extracted = extract_zip(in_input_path)
+    sheet_xml_name = get_sheet_xml_name(extracted, SHEET_NAME)
+    extracted['xl/styles.xml'], date_style = get_date_style(extracted['xl/styles.xml'])
+    extracted[sheet_xml_name] = generate_sheet_xml(extracted[sheet_xml_name], DATA, COLUMN_NAMES, FORMULAS,
+                                                   row_offset=1, column_offset=1, date_style=date_style)
+    insert_zip(str(in_output_path), extracted)
+    return load_workbook(in_output_path)
+
+
+def get_values(in_sheet) -> list:
+    return [[cell.value for cell in row] for row in in_sheet.iter_rows()]
+
+
+@pytest.mark.parametrize('with_data_rows', [True, False])
+def test_generate_sheet_xml_matches_update_sheet(tmp_path, with_data_rows):
+    input_path = make_workbook(tmp_path / 'model.xlsx', with_data_rows)
+    streamed = stream_workbook(input_path, tmp_path / 'streamed.xlsx')
+
+    expected = load_workbook(input_path)
+    update_sheet(expected, SHEET_NAME, DATA, COLUMN_NAMES, FORMULAS, row_offset=1, column_offset=1)
+
+    assert get_values(streamed[SHEET_NAME]) == get_values(expected[SHEET_NAME])
+    assert streamed['Other']['A1'].value == 'kept'
+    sheet = streamed[SHEET_NAME]
+    assert [sheet.cell(row=row, column=1).number_format for row in (2, 3, 4)] == ['dd.mm.yyyy'] * 3
+    assert sheet['B5'].value == '=SUM(B2:B4)'
+    assert sheet['A5'].value == -1
+
+
+def test_get_date_style_reuses_existing_style(tmp_path):
+    extracted = extract_zip(make_workbook(tmp_path / 'model.xlsx', in_with_data_rows=False))
+    styles_xml, date_style = get_date_style(extracted['xl/styles.xml'])
+    assert styles_xml != extracted['xl/styles.xml']
+    assert get_date_style(styles_xml) == (styles_xml, date_style)
+
+
+def test_generate_sheet_xml_refuses_shared_formulas():
+    sheet_xml = (b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                 b'<row r="1"><c r="A1"><f t="shared" ref="A1:A2" si="0">B1*2</f><v>2</v></c></row>'
+                 b'<row r="2"><c r="A2"><f t="shared" si="0"/><v>4</v></c></row>'
+                 b'</sheetData></worksheet>')
+    assert has_shared_formulas(sheet_xml)
+    with pytest.raises(ValueError):
+        generate_sheet_xml(sheet_xml, DATA, COLUMN_NAMES, FORMULAS, row_offset=1, column_offset=1)
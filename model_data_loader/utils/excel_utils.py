@@ -1,11 +1,17 @@
 import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from numbers import Number
 from string import ascii_uppercase as auc
 from xml.etree import ElementTree
+from xml.sax.saxutils import escape
 from io import StringIO
 
 from loguru import logger
+from openpyxl.reader.excel import load_workbook
+from openpyxl.utils import get_column_letter, column_index_from_string
 from openpyxl.workbook import Workbook
-from pandas import DataFrame
+from pandas import DataFrame, Timestamp, Timedelta, isna
 
 
 def excel_to_int(excel_index: str) -> int:
@@ -87,6 +93,62 @@ def get_first_num_row_index(workbook, sheet_name, check_column_index) -> int:
     return i - 1
 
 
+@dataclass(frozen=True)
+class SheetMetadata:
+    """
+    Данные листа, нужные для генерации запроса и обновления листа
+    Attributes:
+        column_offset: количество первых пустых ячеек в строке check_line_index, см. get_column_offset
+        row_offset: индекс первой строки с числовым или формульным форматом, см. get_first_num_row_index
+        column_names: значения строки с именами колонок (строка row_offset, нумерация с 1)
+        formulas: значения последней строки
+        max_row: номер последней строки
+    """
+    column_offset: int
+    row_offset: int
+    column_names: list[str]
+    formulas: list[str]
+    max_row: int
+
+
+def read_sheet_metadata(file_path: str, sheet_name: str, check_line_index: int = 10,
+                        check_column_index: int = 10) -> SheetMetadata:
+    """
+    Читает метаданные листа за один проход по нему в режиме openpyxl read-only, не загружая книгу целиком.
+    Результат совпадает с get_column_offset, get_first_num_row_index и load_xlsx_row для полностью загруженной книги
+    Parameters:
+        file_path: путь к xlsx файлу
+        sheet_name: имя листа
+        check_line_index: индекс строки, которая гарантированно не будет полностью пустой (нумерация с 1)
+        check_column_index: индекс колонки, которая гарантированно не будет полностью пустой (нумерация с 0)
+    """
+    def row_to_strings(row) -> list[str]:
+        return [str(cell.value or '').strip() for cell in row]
+
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise ValueError('Target sheet with name "' + sheet_name + '" was not found')
+        column_offset = row_offset = None
+        column_names = []
+        previous_row = last_row = ()
+        max_row = 0
+        for max_row, row in enumerate(workbook[sheet_name].iter_rows(), start=1):
+            if max_row == check_line_index:
+                column_offset = next((i for i, cell in enumerate(row) if cell.value is not None), len(row))
+            if row_offset is None and len(row) > check_column_index:
+                cell = row[check_column_index]
+                if cell.value is not None and cell.data_type in ('n', 'f'):
+                    row_offset = max_row - 1
+                    column_names = row_to_strings(previous_row)
+            previous_row = last_row = row
+    finally:
+        workbook.close()
+    if column_offset is None or row_offset is None:
+        raise ValueError(f'sheet "{sheet_name}" has no data rows')
+    return SheetMetadata(column_offset, row_offset, column_names, row_to_strings(last_row), max_row)
+
+
 # TODO возможно решение уже есть в openpyxl, но по нему очень мало документации:
 #  https://openpyxl.readthedocs.io/en/stable/api/openpyxl.workbook.external_link.external.html
 # TODO do more testing
@@ -166,3 +228,285 @@ def update_sheet(workbook: Workbook, sheet_name: str, data: DataFrame, column_na
         sheet.cell(row=last_row_index, column=date_column_index).value = -1
     else:
         logger.info('date was matched')
+
+
+def get_sheet_xml_name(extracted_zip: dict[str, bytes], sheet_name: str) -> str:
+    """
+    Возвращает имя файла листа sheet_name внутри xlsx (xl/worksheets/sheetN.xml)
+    Parameters:
+        extracted_zip: словарь, ключи - имена файлов внутри zip'а, значения - бинарные файлы, см. :fun: `extract_zip`
+        sheet_name: имя листа
+    """
+    workbook_xml_str = extracted_zip['xl/workbook.xml'].decode("utf-8")
+
+    # взято с https://stackoverflow.com/a/42338368
+    namespace = dict([node for _, node in ElementTree.iterparse(StringIO(workbook_xml_str), events=['start-ns'])])
+
+    tree = ElementTree.fromstring(workbook_xml_str)
+    sheets = tree.findall('.//{' + namespace[''] + '}sheet')
+
+    for sheet in sheets:
+        if sheet.attrib['name'] == sheet_name:
+            sheet_r_id = sheet.attrib['{' + namespace['r'] + '}id']
+            matcher = re.search(r'\d+$', sheet_r_id)
+            if not matcher:
+                raise ValueError('cant find index')
+            return 'xl/worksheets/sheet' + matcher.group() + '.xml'
+    raise ValueError(f'Target list "{sheet_name}" was not found')
+
+
+SHEET_DATA_PATTERN = re.compile(r'<sheetData\b[^>]*?(?:/>|>(.*?)</sheetData>)', re.S)
+ROW_PATTERN = re.compile(r'(<row\b[^>]*?)(?:/>|>(.*?)</row>)', re.S)
+ROW_INDEX_PATTERN = re.compile(r'\br="(\d+)"')
+CELL_PATTERN = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+CELL_REFERENCE_PATTERN = re.compile(r'\br="([A-Z]+)(\d+)"')
+CELL_STYLE_PATTERN = re.compile(r'\bs="(\d+)"')
+CELL_VALUE_PATTERN = re.compile(r'<v>(.*?)</v>', re.S)
+DIMENSION_PATTERN = re.compile(r'<dimension ref="([A-Z]+\d+)(?::([A-Z]+)\d+)?"\s*/>')
+SHARED_FORMULA_PATTERN = re.compile(r'<f\b[^>]*\bt="shared"')
+CELL_XFS_PATTERN = re.compile(r'<cellXfs\b[^>]*?(?:/>|>(.*?)</cellXfs>)', re.S)
+XF_PATTERN = re.compile(r'<xf\b[^>]*?(?:/>|>.*?</xf>)', re.S)
+NUM_FMTS_PATTERN = re.compile(r'<numFmts\b[^>]*?(?:/>|>(.*?)</numFmts>)', re.S)
+NUM_FMT_PATTERN = re.compile(r'<numFmt\b[^>]*?\bnumFmtId="(\d+)"[^>]*?\bformatCode="([^"]*)"[^>]*?/>')
+
+# дата, соответствующая нулю в числовом представлении дат Excel
+EXCEL_EPOCH = Timestamp('1899-12-30')
+# формат ячеек с датами, как в update_sheet
+DATE_NUMBER_FORMAT = 'dd.mm.yyyy'
+# первый id пользовательского числового формата, меньшие id зарезервированы Excel
+FIRST_CUSTOM_NUM_FMT_ID = 164
+
+
+def get_cell_style(cell_xml: str | None) -> str | None:
+    if cell_xml is None:
+        return None
+    matcher = CELL_STYLE_PATTERN.search(cell_xml[:cell_xml.index('>')])
+    return matcher.group(1) if matcher else None
+
+
+def get_cell_number(cell_xml: str | None) -> float | None:
+    """
+    Возвращает числовое значение ячейки или None, если ячейка пустая или не числовая
+    """
+    if cell_xml is None or re.search(r'\bt="(?!n")', cell_xml[:cell_xml.index('>')]):
+        return None
+    matcher = CELL_VALUE_PATTERN.search(cell_xml)
+    return float(matcher.group(1)) if matcher else None
+
+
+def get_row_cells(row_content: str | None) -> dict[int, str]:
+    """
+    Возвращает XML ячеек строки листа вида {номер колонки: XML ячейки}
+    """
+    cells = {}
+    for cell_xml in CELL_PATTERN.findall(row_content or ''):
+        column_letter, _ = CELL_REFERENCE_PATTERN.search(cell_xml).groups()
+        cells[column_index_from_string(column_letter)] = cell_xml
+    return cells
+
+
+def has_shared_formulas(sheet_xml: bytes) -> bool:
+    """
+    Проверяет, есть ли в листе общие формулы (<f t="shared">). Зависимые ячейки ссылаются на ячейку-источник
+    общей формулы, поэтому такой лист нельзя менять в generate_sheet_xml без разворачивания формул,
+    его нужно обновлять через openpyxl (update_sheet)
+    """
+    return SHARED_FORMULA_PATTERN.search(sheet_xml.decode('utf-8')) is not None
+
+
+def get_date_style(styles_xml: bytes, number_format: str = DATE_NUMBER_FORMAT) -> tuple[bytes, str]:
+    """
+    Возвращает индекс стиля ячейки с числовым форматом number_format, при отсутствии такого стиля
+    добавляет его в xl/styles.xml. Используется generate_sheet_xml для дат, если в листе нет строки данных,
+    стиль которой можно взять за образец
+    Parameters:
+        styles_xml: исходный xl/styles.xml книги
+        number_format: числовой формат ячейки
+    Returns:
+        xl/styles.xml (исходный, если стиль уже был) и индекс стиля
+    """
+    styles_xml_str = styles_xml.decode('utf-8')
+    format_code = escape(number_format, {'"': '&quot;'})
+    num_fmts = NUM_FMTS_PATTERN.search(styles_xml_str)
+    num_fmts_content = (num_fmts.group(1) or '') if num_fmts is not None else ''
+    num_fmt_ids = {code: num_fmt_id for num_fmt_id, code in NUM_FMT_PATTERN.findall(num_fmts_content)}
+    cell_xfs = CELL_XFS_PATTERN.search(styles_xml_str)
+    if cell_xfs is None:
+        raise ValueError('cellXfs was not found in styles xml')
+    xfs = XF_PATTERN.findall(cell_xfs.group(1) or '')
+    num_fmt_id = num_fmt_ids.get(format_code)
+    if num_fmt_id is not None:
+        for index, xf in enumerate(xfs):
+            if re.search(rf'\bnumFmtId="{num_fmt_id}"', xf):
+                return styles_xml, str(index)
+
+    if num_fmt_id is None:
+        num_fmt_id = str(max([int(i) + 1 for i in num_fmt_ids.values()] + [FIRST_CUSTOM_NUM_FMT_ID]))
+        num_fmt = f'<numFmt numFmtId="{num_fmt_id}" formatCode="{format_code}"/>'
+        if num_fmts is None:
+            # numFmts должен быть первым элементом styleSheet
+            position = re.search(r'<styleSheet\b[^>]*>', styles_xml_str).end()
+            styles_xml_str = (styles_xml_str[:position] + f'<numFmts count="1">{num_fmt}</numFmts>'
+                              + styles_xml_str[position:])
+        else:
+            num_fmts_xml = f'<numFmts count="{len(num_fmt_ids) + 1}">' + num_fmts_content + num_fmt + '</numFmts>'
+            styles_xml_str = styles_xml_str[:num_fmts.start()] + num_fmts_xml + styles_xml_str[num_fmts.end():]
+        cell_xfs = CELL_XFS_PATTERN.search(styles_xml_str)
+
+    xf = f'<xf numFmtId="{num_fmt_id}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    cell_xfs_xml = f'<cellXfs count="{len(xfs) + 1}">' + (cell_xfs.group(1) or '') + xf + '</cellXfs>'
+    styles_xml_str = styles_xml_str[:cell_xfs.start()] + cell_xfs_xml + styles_xml_str[cell_xfs.end():]
+    return styles_xml_str.encode('utf-8'), str(len(xfs))
+
+
+def make_cell_xml(column_index: int, row_index: int, value, style: str | None) -> str:
+    """
+    Формирует XML ячейки так же, как openpyxl: строки, начинающиеся с '=', записываются формулами,
+    даты - числами Excel, пропуски - пустыми ячейками
+    Parameters:
+        column_index: номер колонки, нумерация с 1
+        row_index: номер строки, нумерация с 1
+        value: значение ячейки
+        style: индекс стиля ячейки в xl/styles.xml
+    """
+    attributes = f'r="{get_column_letter(column_index)}{row_index}"' + (f' s="{style}"' if style is not None else '')
+    if value is None or (not isinstance(value, str) and isna(value)):
+        return f'<c {attributes}/>'
+    if isinstance(value, bool):
+        return f'<c {attributes} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (datetime, date)):
+        value = (Timestamp(value) - EXCEL_EPOCH) / Timedelta(days=1)
+        value = int(value) if value == int(value) else value
+    if isinstance(value, Number):
+        return f'<c {attributes}><v>{value}</v></c>'
+    value = str(value)
+    if value.startswith('='):
+        return f'<c {attributes}><f>{escape(value[1:])}</f></c>'
+    return f'<c {attributes} t="inlineStr"><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+def make_row_xml(row_tag: str, cells: dict[int, str]) -> str:
+    # spans - необязательная подсказка для Excel, после изменения строки она может стать неверной
+    row_tag = re.sub(r'\sspans="[^"]*"', '', row_tag)
+    return row_tag + '>' + ''.join(cells[column_index] for column_index in sorted(cells)) + '</row>'
+
+
+def generate_sheet_xml(sheet_xml: bytes, data: DataFrame, column_names: list[str], formulas: list[str],
+                       row_offset: int, column_offset: int, date_style: str | None = None) -> bytes:
+    """
+    Потоковый аналог update_sheet: заносит данные из data в XML листа, не загружая книгу в openpyxl.
+    Строки листа обходятся по порядку: строки без новых данных (заголовки, строки после данных) копируются
+    как есть без разбора ячеек, в строки данных заносятся значения data, недостающие строки вставляются
+    по порядку. В каждый момент разобраны только ячейки текущей строки.
+    Ячейкам данных без собственного стиля назначается стиль той же колонки из первой строки данных,
+    ячейкам строки с формулами - стиль той же колонки из исходной последней строки. Если стиля для колонки
+    с датами нет, используется date_style (см. get_date_style), как number_format в update_sheet.
+    Листы с общими формулами не поддерживаются, см. has_shared_formulas
+    Parameters:
+        sheet_xml: исходный xl/worksheets/sheetN.xml листа
+        data: pandas DataFrame, названия колонок такие же как и в column_names (кол-во м.б. и меньше)
+        column_names: названия всех колонок в листе
+        formulas: формулы для сохранения в последней строке
+        row_offset: начальный адрес строки, нумерация с 0
+        column_offset: начальный адрес колонки, нумерация с 0
+        date_style: индекс стиля в xl/styles.xml для дат, если в листе нет строки данных
+    Returns:
+        новый XML листа
+    """
+    if has_shared_formulas(sheet_xml):
+        raise ValueError('sheet has shared formulas, it has to be updated with update_sheet')
+    sheet_xml_str = sheet_xml.decode('utf-8')
+    sheet_data = SHEET_DATA_PATTERN.search(sheet_xml_str)
+    if sheet_data is None:
+        raise ValueError('sheetData was not found in sheet xml')
+
+    column_indexes = [column_names.index(column_name) + column_offset for column_name in data.columns]
+    date_column_index = column_indexes[list(data.columns).index('Date')] if 'Date' in data.columns else -1
+    # j+1 т.к. в екселе строки нумеруются с 1
+    data_rows = enumerate(data.itertuples(index=False, name=None), start=row_offset + 1)
+    data_row = next(data_rows, None)
+    data_styles = {}
+    rows_xml = []
+    # последняя непустая строка после записи данных и последняя непустая строка исходного листа
+    last_row_index, last_cells = 0, {}
+    last_original_row_content = None
+    max_column_index = max(column_indexes, default=1)
+
+    def write_data_row(row_index: int, row_tag: str, cells: dict[int, str]) -> None:
+        nonlocal last_row_index, last_cells
+        for column_index, value in zip(column_indexes, data_row[1]):
+            style = get_cell_style(cells.get(column_index)) or data_styles.get(column_index)
+            if style is None and column_index == date_column_index:
+                style = date_style
+            cells[column_index] = make_cell_xml(column_index, row_index, value, style)
+        rows_xml.append(make_row_xml(row_tag, cells))
+        last_row_index, last_cells = row_index, cells
+
+    for row_matcher in ROW_PATTERN.finditer(sheet_data.group(1) or ''):
+        row_tag, row_content = row_matcher.groups()
+        row_index = int(ROW_INDEX_PATTERN.search(row_tag).group(1))
+        while data_row is not None and data_row[0] < row_index:
+            write_data_row(data_row[0], f'<row r="{data_row[0]}"', {})
+            data_row = next(data_rows, None)
+        has_cells = bool(row_content and CELL_PATTERN.search(row_content))
+        if row_index == row_offset + 1:
+            data_styles = {column_index: get_cell_style(cell_xml)
+                           for column_index, cell_xml in get_row_cells(row_content).items()}
+        if has_cells:
+            last_original_row_content = row_content
+        if data_row is not None and data_row[0] == row_index:
+            write_data_row(row_index, row_tag, get_row_cells(row_content))
+            data_row = next(data_rows, None)
+            continue
+        rows_xml.append(row_matcher.group(0))
+        if has_cells:
+            last_row_index, last_cells = row_index, row_content
+    while data_row is not None:
+        write_data_row(data_row[0], f'<row r="{data_row[0]}"', {})
+        data_row = next(data_rows, None)
+
+    if isinstance(last_cells, str):
+        last_cells = get_row_cells(last_cells)
+    if last_original_row_content is not None:
+        formula_styles = {column_index: get_cell_style(cell_xml)
+                          for column_index, cell_xml in get_row_cells(last_original_row_content).items()}
+    else:
+        formula_styles = data_styles
+
+    # check if last row is already filled with formulas (date cell value is -1)
+    last_date_cell_value = get_cell_number(last_cells.get(date_column_index))
+    logger.info('checking if last row contains formulas')
+    if last_date_cell_value != -1:
+        logger.info('creating last row with formulas')
+        last_row_index += 1
+        cells = {}
+        for column_index, formula in enumerate(formulas):
+            if column_index + column_offset < 1:
+                continue
+            cells[column_index + column_offset] = make_cell_xml(
+                column_index + column_offset, last_row_index, formula or None,
+                formula_styles.get(column_index + column_offset))
+        cells[date_column_index] = make_cell_xml(date_column_index, last_row_index, -1,
+                                                 formula_styles.get(date_column_index))
+        # формулы пишутся после последней непустой строки, пустая строка на их месте заменяется
+        trailing_rows = []
+        while rows_xml and int(ROW_INDEX_PATTERN.search(rows_xml[-1]).group(1)) >= last_row_index:
+            trailing_rows.insert(0, rows_xml.pop())
+        rows_xml.append(make_row_xml(f'<row r="{last_row_index}"', cells))
+        rows_xml.extend(row_xml for row_xml in trailing_rows
+                        if int(ROW_INDEX_PATTERN.search(row_xml).group(1)) > last_row_index)
+        max_column_index = max(max_column_index, max(cells))
+    else:
+        logger.info('date was matched')
+
+    max_row_index = int(ROW_INDEX_PATTERN.search(rows_xml[-1]).group(1)) if rows_xml else 1
+    result = (sheet_xml_str[:sheet_data.start()] + '<sheetData>' + ''.join(rows_xml) + '</sheetData>'
+              + sheet_xml_str[sheet_data.end():])
+
+    def make_dimension(matcher) -> str:
+        column_index = max_column_index
+        if matcher.group(2):
+            column_index = max(column_index, column_index_from_string(matcher.group(2)))
+        return f'<dimension ref="{matcher.group(1)}:{get_column_letter(column_index)}{max_row_index}"/>'
+
+    return DIMENSION_PATTERN.sub(make_dimension, result, count=1).encode('utf-8')
@@ -19,6 +19,10 @@ class TradingHubParser:
         'rlMoT_L_Gas': 'RLMoT L-Gas'
     }
 
+    # Session keeps the connection alive between parse calls
+    session = requests.Session()
+    timeout = (10, 60)
+
     def __init__(self, end_date: date, start_date: date = None):
         if start_date is None:
             self.start_date = end_date - timedelta(days=10)
@@ -37,7 +41,7 @@ class TradingHubParser:
 
     def parse(self):
         url = self.get_url()
-        r = requests.get(url)
+        r = self.session.get(url, timeout=self.timeout)
         json_data = r.json()
 
         # The JSON has the next structure